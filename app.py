@@ -2,6 +2,7 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 from modules.controller import controller
+from modules.models.loader import warm_models
 
 # Load Environment Variables
 
@@ -9,6 +10,10 @@ load_dotenv()
 if not os.getenv("GOOGLE_API_KEY"):
     st.warning("GOOGLE_API_KEY belum ditemukan di file .env")
 
+# Warm AI models once per process (shared by all sessions)
+
+warm_models()
+
 # Streamlit Page Configuration
 
 st.set_page_config(
@@ -0,0 +1,83 @@
+"""
+Participant × item share-matrix allocation.
+
+Given a weight matrix W (participants × items) and item prices:
+- each item's price is divided by the weights in its column
+  (weight 1 each = equal split, any positive numbers = weighted split)
+- amounts are rounded to the minor currency unit with the
+  largest-remainder method, so every item's shares add up exactly to
+  its price and no rounding drift accumulates
+- participant totals are one matrix-vector product
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+
+MINOR_UNIT = 0.01  # default rounding step; callers pass the currency's own (utils.get_minor_unit)
+
+
+@dataclass
+class Allocation:
+    """Result of a split: who pays how much of which item."""
+
+    participant_ids: List[str]
+    item_ids: List[str]
+    shares: np.ndarray    # (P, I) fraction of each item paid by each participant
+    amounts: np.ndarray   # (P, I) rounded amount per participant and item
+    totals: np.ndarray    # (P,) rounded amount per participant
+    minor_unit: float = MINOR_UNIT
+
+    def total_for(self, participant_id: str) -> float:
+        try:
+            return float(self.totals[self.participant_ids.index(participant_id)])
+        except ValueError:
+            return 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(zip(self.participant_ids, self.totals.tolist()))
+
+
+def largest_remainder(exact_units: np.ndarray, target_units: np.ndarray) -> np.ndarray:
+    """
+    Round each column of `exact_units` (P, I) to integers that sum to
+    `target_units` (I,): floor everything, then give the leftover units
+    to the largest fractional parts. Ties rotate with the column, so an
+    equal split over many items doesn't always charge the same person
+    the extra cent.
+    """
+    n_rows, n_cols = exact_units.shape
+    floor = np.floor(exact_units + 1e-9)
+    leftover = (target_units - floor.sum(axis=0)).astype(np.int64)
+    remainder = np.round(exact_units - floor, 9)
+
+    # Rank of every cell within its column: descending remainder, then rotated row
+    rotation = (np.arange(n_rows)[:, None] - np.arange(n_cols)[None, :]) % n_rows
+    order = np.lexsort((rotation, -remainder), axis=0)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(n_rows)[:, None], axis=0)
+    return (floor + (ranks < leftover[None, :])).astype(np.int64)
+
+
+def allocate(weights: np.ndarray, prices: np.ndarray, participant_ids: List[str], item_ids: List[str],
+             minor_unit: float = MINOR_UNIT) -> Allocation:
+    """Split `prices` (I,) by `weights` (P, I); items nobody holds a weight in stay unallocated."""
+    weights = np.asarray(weights, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    n_participants = weights.shape[0]
+
+    column_weight = weights.sum(axis=0)
+    held = column_weight > 0
+    shares = np.zeros_like(weights)
+    shares[:, held] = weights[:, held] / column_weight[held]
+
+    price_units = np.rint(prices / minor_unit)
+    units = np.zeros(weights.shape, dtype=np.int64)
+    if n_participants and held.any():
+        units[:, held] = largest_remainder(shares[:, held] * price_units[held], price_units[held])
+
+    amounts = units * minor_unit
+    totals = np.round((units @ np.ones(units.shape[1], dtype=np.int64)) * minor_unit, 10)
+    return Allocation(participant_ids, item_ids, shares, amounts, totals, minor_unit)
@@ -1,6 +1,9 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
+from modules.data.allocation import MINOR_UNIT, Allocation, allocate
+from modules.data.name_index import NameIndex, normalize
 from modules.data.receipt_data import ItemData
+import numpy as np
 import uuid
 
 
@@ -22,12 +25,27 @@ class ParticipantData:
 
 @dataclass
 class AssignedItemData:
-    """Link a receipt item to a participant."""
+    """
+    Link a receipt item to a participant.
+
+    `assigned_count` (or an explicit `ratio`) is this participant's weight
+    in the item; `share` and `amount` are filled in by SplitManager's
+    allocation (fraction of the item and the rounded amount to pay).
+    """
     item: ItemData
     assigned_count: int = 1
+    ratio: Optional[float] = None
+    share: float = 0.0
+    amount: Optional[float] = None
+
+    @property
+    def weight(self) -> float:
+        return self.ratio if self.ratio is not None else float(self.assigned_count)
 
     @property
     def total_price(self) -> float:
+        if self.amount is not None:
+            return self.amount
         return round(self.item.price * self.assigned_count, 2)
 
 
@@ -35,28 +53,77 @@ class AssignedItemData:
 
 
 class SplitManager:
-    """Manage participants and their item assignments safely."""
-
-    def __init__(self, participants: List[ParticipantData], receipt_items: Dict[str, ItemData]):
+    """
+    Manage participants and their item assignments safely.
+
+    Indexes kept up to date on every assign / unassign (O(1) each):
+    - participant id → {item id → AssignedItemData}
+    - item id → {participant id → AssignedItemData}
+    - set of unassigned item ids
+
+    Money is split by `allocation()`: a participant × item weight matrix
+    is turned into shares, rounded to the currency's minor unit per item
+    (largest remainder, so shared items add up exactly to their price) and summed
+    per participant. The result is cached until assignments or receipt
+    items change.
+
+    Receipt item changes (edits, adds, deletes) are picked up lazily via
+    the item store's version counter.
+    """
+
+    def __init__(self, participants: List[ParticipantData], receipt_items: Dict[str, ItemData],
+                 minor_unit: float = MINOR_UNIT):
         self.participants: Dict[str, ParticipantData] = {p.id: p for p in participants}
-        self.receipt_items: Dict[str, ItemData] = receipt_items
-        self.participant_assignments: Dict[str, List[AssignedItemData]] = {}
+        self._by_participant: Dict[str, Dict[str, AssignedItemData]] = {pid: {} for pid in self.participants}
+        self._by_item: Dict[str, Dict[str, AssignedItemData]] = {}
+        self._unassigned: Set[str] = set()
+        self._name_index = NameIndex()
+        self._items_state = None
+        self._version = 0  # bumped on every assignment change
+        self._allocation: Optional[Allocation] = None
+        self._allocation_state = None
+        self.minor_unit = minor_unit  # rounding step of the bill's currency (utils.get_minor_unit)
+        self.receipt_items = receipt_items
+
+    # Receipt Items
 
-        # Build quick lookup map for name → ItemData
-        self.name_map: Dict[str, ItemData] = {
-            item.name.lower(): item for item in self.receipt_items.values()
-        }
+    @property
+    def receipt_items(self) -> Dict[str, ItemData]:
+        return self._receipt_items
+
+    @receipt_items.setter
+    def receipt_items(self, items: Dict[str, ItemData]) -> None:
+        self._receipt_items = items
+        self._sync_items()
+
+    def _sync_items(self) -> None:
+        """Rebuild item lookups only when the receipt items changed."""
+        items = self._receipt_items
+        state = (id(items), getattr(items, "version", None), len(items))
+        if state == self._items_state:
+            return
+        self._items_state = state
+
+        # Build quick lookup map for name → ItemData and id → ItemData
+        self.name_map: Dict[str, ItemData] = {normalize(item.name): item for item in items.values()}
+        self._items_by_id: Dict[str, ItemData] = {item.id: item for item in items.values()}
+        self._name_index.sync({item_id: item.name for item_id, item in self._items_by_id.items()})
+        self._unassigned = {item_id for item_id in self._items_by_id if not self._by_item.get(item_id)}
 
     # Participant Management
 
     def add_participant(self, name: str):
         new_p = ParticipantData(name=name)
         self.participants[new_p.id] = new_p
-        self.participant_assignments[new_p.id] = []
+        self._by_participant[new_p.id] = {}
+        self._version += 1
 
     def remove_participant(self, participant_id: str):
+        for item_id in list(self._by_participant.get(participant_id, {})):
+            self.remove_assignment(participant_id, item_id)
         self.participants.pop(participant_id, None)
-        self.participant_assignments.pop(participant_id, None)
+        self._by_participant.pop(participant_id, None)
+        self._version += 1
 
     # Assignment Logic
 
@@ -64,72 +131,221 @@ class SplitManager:
         """
         Assign item by either ID or Name (always safe).
         Never raises errors even if mismatched.
+        Assigning the same item twice to one person adds to its count.
         """
-        if participant_id not in self.participant_assignments:
-            self.participant_assignments[participant_id] = []
-
         item = self._safe_lookup(item_key)
 
         if not item:
             # Skip silently instead of printing warnings
             return
 
-        self.participant_assignments[participant_id].append(
-            AssignedItemData(item=item, assigned_count=count)
-        )
+        entry = self._by_participant.setdefault(participant_id, {}).get(item.id)
+        if entry is None:
+            self._put(participant_id, item, count=count)
+        else:
+            entry.assigned_count += count
+            self._version += 1
+
+    def _put(self, participant_id: str, item: ItemData, count: int = 1, ratio: Optional[float] = None) -> None:
+        """Create or overwrite one assignment (no lookup, no sync)."""
+        entry = AssignedItemData(item=item, assigned_count=count, ratio=ratio)
+        self._by_participant.setdefault(participant_id, {})[item.id] = entry
+        self._by_item.setdefault(item.id, {})[participant_id] = entry
+        self._unassigned.discard(item.id)
+        self._version += 1
 
     def _safe_lookup(self, key: str) -> Optional[ItemData]:
         """
         Always find item safely by ID or name.
         Works even if item.id and dict key mismatch.
         """
+        self._sync_items()
+
         # Case 1: Match by dict key
         if key in self.receipt_items:
             return self.receipt_items[key]
 
-        # Case 2: Match by exact name
-        if key.lower() in self.name_map:
-            return self.name_map[key.lower()]
+        # Case 2: Match by item.id
+        if key in self._items_by_id:
+            return self._items_by_id[key]
 
-        # Case 3: Match by partial fuzzy name
-        for name, item in self.name_map.items():
-            if key.lower() in name or name in key.lower():
-                return item
+        # Case 3: Match by exact (normalised) name
+        norm = normalize(key)
+        if norm in self.name_map:
+            return self.name_map[norm]
 
-        # Case 4: Match by item.id (fallback)
-        for item in self.receipt_items.values():
-            if getattr(item, "id", "") == key:
-                return item
+        # Case 4: Best fuzzy match from the trigram index (scored, deterministic)
+        item_id = self._name_index.best_match(key)
+        if item_id is not None:
+            return self._items_by_id[item_id]
 
         # Nothing found
         return None
 
+    def assign_items_by_name(self, participant_id: str, names: List[str]) -> List[Optional[str]]:
+        """Bulk assign by (fuzzy) name, e.g. from chat or an import; returns matched item ids."""
+        matched = []
+        for name in names:
+            item = self._safe_lookup(name)
+            if item is not None:
+                self.assign_item(participant_id, item.id)
+            matched.append(item.id if item is not None else None)
+        return matched
+
     def remove_assignment(self, participant_id: str, item_id: str):
-        if participant_id not in self.participant_assignments:
+        entry = self._by_participant.get(participant_id, {}).pop(item_id, None)
+        if entry is None:
             return
-        self.participant_assignments[participant_id] = [
-            it for it in self.participant_assignments[participant_id]
-            if it.item.id != item_id
-        ]
+        assignees = self._by_item.get(item_id, {})
+        assignees.pop(participant_id, None)
+        if not assignees:
+            self._by_item.pop(item_id, None)
+            if item_id in self._items_by_id:
+                self._unassigned.add(item_id)
+        self._version += 1
+
+    # Shared Items
+
+    def split_equally(self, item_ids: Optional[List[str]] = None, participant_ids: Optional[List[str]] = None):
+        """Share each item equally between the participants (default: every item, everyone)."""
+        self._sync_items()
+        pids = list(self.participants) if participant_ids is None else participant_ids
+        items = self.get_all_items() if item_ids is None else [self._safe_lookup(k) for k in item_ids]
+        for item in items:
+            if item is None:
+                continue
+            for pid in pids:
+                self._put(pid, item)
+
+    def split_weighted(self, item_key: str, weights: Dict[str, float]):
+        """
+        Replace an item's assignees with weighted shares, e.g.
+        {alice: 2, bob: 1} → Alice pays 2/3, Bob 1/3. Zero weights are dropped.
+        """
+        item = self._safe_lookup(item_key)
+        if not item:
+            return
+        for pid in list(self._by_item.get(item.id, {})):
+            self.remove_assignment(pid, item.id)
+        for pid, weight in weights.items():
+            if weight > 0:
+                self._put(pid, item, ratio=float(weight))
+
+    def apply_allocation(self, allocation: Allocation, replace: bool = True):
+        """
+        Bulk-assign from an Allocation (e.g. AutoSplitEngine): every
+        non-zero share becomes an assignment weighted by that share.
+        With `replace`, the allocated items lose their previous assignees.
+        """
+        self._sync_items()
+        if replace:
+            for item_id in allocation.item_ids:
+                for pid in self._by_item.pop(item_id, {}):
+                    self._by_participant.get(pid, {}).pop(item_id, None)
+                if item_id in self._items_by_id:
+                    self._unassigned.add(item_id)
+
+        rows, cols = np.nonzero(allocation.shares)
+        shares = allocation.shares[rows, cols].tolist()
+        for r, c, share in zip(rows.tolist(), cols.tolist(), shares):
+            item = self._items_by_id.get(allocation.item_ids[c])
+            if item is not None:
+                self._put(allocation.participant_ids[r], item, ratio=share)
+        self._version += 1
+
+    # Allocation
+
+    def allocation(self) -> Allocation:
+        """Current split as a share matrix with cent-exact amounts (cached)."""
+        self._sync_items()
+        state = (self._version, self._items_state, self.minor_unit)
+        if self._allocation is not None and self._allocation_state == state:
+            return self._allocation
+
+        pids = list(self._by_participant)
+        item_ids = list(self._items_by_id)
+        row_of = {pid: r for r, pid in enumerate(pids)}
+        col_of = {item_id: c for c, item_id in enumerate(item_ids)}
+
+        # Sparse (row, col, weight) triples → dense weight matrix
+        entries, rows, cols, weights = [], [], [], []
+        for pid, assigned in self._by_participant.items():
+            for item_id, entry in assigned.items():
+                col = col_of.get(item_id)
+                if col is None:
+                    entry.share, entry.amount = 0.0, 0.0  # item no longer on the receipt
+                    continue
+                entries.append(entry)
+                rows.append(row_of[pid])
+                cols.append(col)
+                weights.append(entry.weight)
+
+        matrix = np.zeros((len(pids), len(item_ids)), dtype=np.float64)
+        matrix[rows, cols] = weights  # (participant, item) pairs are unique
+        prices = getattr(self.receipt_items, "prices", None)
+        if prices is None:
+            prices = np.fromiter((it.price for it in self._items_by_id.values()), dtype=np.float64,
+                                 count=len(item_ids))
+
+        result = allocate(matrix, prices, pids, item_ids, self.minor_unit)
+        shares = result.shares[rows, cols].tolist()
+        amounts = np.round(result.amounts[rows, cols], 2).tolist()
+        for entry, share, amount in zip(entries, shares, amounts):
+            entry.share, entry.amount = share, amount
+
+        self._allocation, self._allocation_state = result, state
+        return result
 
     # Retrieval & Calculation
 
+    @property
+    def participant_assignments(self) -> Dict[str, List[AssignedItemData]]:
+        """participant id → assignments (read-only snapshot, kept for older callers)."""
+        return {pid: list(assigned.values()) for pid, assigned in self._by_participant.items()}
+
+    def get_all_participants(self) -> List[ParticipantData]:
+        return list(self.participants.values())
+
+    def get_all_items(self) -> List[ItemData]:
+        return list(self.receipt_items.values())
+
     def get_assignments(self, participant_id: str) -> List[AssignedItemData]:
-        return self.participant_assignments.get(participant_id, [])
+        self.allocation()  # keep share / amount current
+        return list(self._by_participant.get(participant_id, {}).values())
+
+    def is_assigned_to(self, participant_id: str, item_id: str) -> bool:
+        return item_id in self._by_participant.get(participant_id, {})
+
+    def get_assignees(self, item_id: str) -> List[str]:
+        return list(self._by_item.get(item_id, {}))
 
     def get_total_assigned_for_item(self, item_id: str) -> int:
-        total = 0
-        for plist in self.participant_assignments.values():
-            total += sum(a.assigned_count for a in plist if a.item.id == item_id)
-        return total
+        return sum(a.assigned_count for a in self._by_item.get(item_id, {}).values())
 
     def get_participant_total(self, participant_id: str) -> float:
-        assigns = self.participant_assignments.get(participant_id, [])
-        return round(sum(a.total_price for a in assigns), 2)
+        return round(self.allocation().total_for(participant_id), 2)
+
+    def available_items(self, participant_id: str) -> List[ItemData]:
+        """Receipt items not yet assigned to this participant (receipt order)."""
+        assigned = self._by_participant.get(participant_id, {})
+        return [it for it in self.receipt_items.values() if it.id not in assigned]
+
+    def unassigned_items(self) -> List[ItemData]:
+        """Receipt items nobody has been assigned yet (receipt order)."""
+        self._sync_items()
+        if not self._unassigned:
+            return []
+        return [it for it in self.receipt_items.values() if it.id in self._unassigned]
+
+    @property
+    def unassigned_count(self) -> int:
+        self._sync_items()
+        return len(self._unassigned)
 
     def get_summary(self) -> Dict[str, float]:
+        totals = self.allocation().as_dict()
         return {
-            p.name: self.get_participant_total(pid)
+            p.name: round(totals.get(pid, 0.0), 2)
             for pid, p in self.participants.items()
         }
 
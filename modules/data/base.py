@@ -1,20 +1,27 @@
 from __future__ import annotations
+import itertools
+import time
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import ClassVar, Dict
+from typing import ClassVar, Dict, Optional
 
 # Unique ID Generator
 
+_serials = itertools.count(1)  # shared by all entities; next() is atomic under the GIL
+
+
 class IDGenerator:
     """Global incremental ID generator (resets each runtime)."""
 
-    _counter: ClassVar[int] = 0
+    @staticmethod
+    def next_serial() -> int:
+        """Next raw serial number (format it only when needed)."""
+        return next(_serials)
 
     @classmethod
     def get(cls, prefix: str = "id") -> str:
         """Generate new unique ID."""
-        cls._counter += 1
-        return f"{prefix}_{cls._counter:04d}"
+        return f"{prefix}_{cls.next_serial():04d}"
 
 
 # Base Entity Class
@@ -58,4 +65,82 @@ class BaseEntity:
         obj.id = data.get("id", obj.id)
         obj.created_at = data.get("created_at", datetime.now().isoformat())
         obj.updated_at = data.get("updated_at", datetime.now().isoformat())
-        return obj
\ No newline at end of file
+        return obj
+
+# Compact Entity (slotted)
+
+
+class CompactEntity:
+    """
+    Slotted variant of BaseEntity for high-volume records such as receipt items.
+
+    Stores a raw serial and `time.time()` floats; the ID string and ISO
+    timestamps are only formatted when read.
+    """
+
+    __slots__ = ("_serial", "_id", "_created", "_updated")
+    id_prefix: ClassVar[str] = "entity"
+
+    def __init__(self):
+        self._serial = next(_serials)
+        self._id: Optional[str] = None
+        self._created = time.time()
+        self._updated: Optional[float] = None
+
+    @property
+    def id(self) -> str:
+        if self._id is None:
+            self._id = f"{self.id_prefix}_{self._serial:04d}"
+        return self._id
+
+    @id.setter
+    def id(self, value: str) -> None:
+        self._id = value
+
+    @property
+    def created_at(self) -> str:
+        return datetime.fromtimestamp(self._created).isoformat()
+
+    @created_at.setter
+    def created_at(self, value: str) -> None:
+        self._created = datetime.fromisoformat(value).timestamp()
+
+    @property
+    def updated_at(self) -> str:
+        return datetime.fromtimestamp(self._updated or self._created).isoformat()
+
+    @updated_at.setter
+    def updated_at(self, value: str) -> None:
+        self._updated = datetime.fromisoformat(value).timestamp()
+
+    @property
+    def created_ts(self) -> float:
+        """Raw creation time (epoch seconds)."""
+        return self._created
+
+    @created_ts.setter
+    def created_ts(self, value: float) -> None:
+        self._created = float(value)
+
+    @property
+    def updated_ts(self) -> float:
+        return self._updated or self._created
+
+    @updated_ts.setter
+    def updated_ts(self, value: float) -> None:
+        self._updated = float(value)
+
+    def update_timestamp(self) -> None:
+        """Refresh update timestamp."""
+        self._updated = time.time()
+
+    def to_dict(self) -> Dict:
+        return {"id": self.id, "created_at": self.created_at, "updated_at": self.updated_at}
+
+    def __setstate__(self, state) -> None:
+        """Unpickle slotted state, or a plain __dict__ from pickles made before __slots__."""
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        self._serial, self._id, self._created, self._updated = 0, None, time.time(), None
+        for key, value in state.items():
+            setattr(self, key, value)
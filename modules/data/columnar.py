@@ -0,0 +1,262 @@
+"""
+Columnar storage for receipt items.
+
+`ItemStore` keeps a receipt's items as parallel NumPy columns:
+- prices         : float64 array
+- category codes : int32 codes into a small category table
+- name ids       : int32 ids into an interned name table
+
+and still behaves like the old `Dict[str, ItemData]` (MutableMapping
+facade), so `receipt.items[key]`, `.values()`, `.clear()` etc. keep
+working. Totals, group-bys and `to_dataframe` read the columns directly
+instead of walking ItemData objects.
+
+Change items through `update_item` (or by assigning a new ItemData) so
+the columns stay in sync; attributes set directly on an ItemData are not
+seen by the columns.
+"""
+
+import sys
+from collections.abc import MutableMapping
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from modules.data.receipt_data import ItemData
+
+
+INITIAL_CAPACITY = 16
+
+
+# Interned Value Table
+
+class _CodeTable:
+    """Append-only value ↔ int code table (category names, item names)."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self._array: Optional[np.ndarray] = None
+
+    def encode(self, values: Sequence[str]) -> np.ndarray:
+        """Codes for many values: each distinct value is looked up once."""
+        uniques_codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+        table = np.array([self.code(u) for u in uniques], dtype=np.int32)
+        return table[uniques_codes]
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[sys.intern(value)] = len(self.values)
+            self.values.append(sys.intern(value))
+            self._array = None
+        return code
+
+    def array(self) -> np.ndarray:
+        """Object array of all values (for vectorised decode: array()[codes])."""
+        if self._array is None:
+            self._array = np.array(self.values, dtype=object)
+        return self._array
+
+
+# Item Store
+
+class ItemStore(MutableMapping):
+    """Dict-style facade over columnar item data (key → ItemData)."""
+
+    def __init__(self, items: Optional[Dict[str, "ItemData"]] = None):
+        self._keys: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._items: List["ItemData"] = []
+        self._prices = np.zeros(INITIAL_CAPACITY, dtype=np.float64)
+        self._category_codes = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self._name_ids = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self.categories = _CodeTable()
+        self.names = _CodeTable()
+        self._total = 0.0  # running sum of prices, kept on every change
+        self.version = 0   # bumped on every change (cheap "did anything change?" check)
+        if items:
+            for key, item in items.items():
+                self[key] = item
+
+    # Columns (read-only views, no copy)
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self._view(self._prices)
+
+    @property
+    def category_codes(self) -> np.ndarray:
+        return self._view(self._category_codes)
+
+    @property
+    def name_ids(self) -> np.ndarray:
+        return self._view(self._name_ids)
+
+    def _view(self, column: np.ndarray) -> np.ndarray:
+        view = column[:len(self._keys)]
+        view.flags.writeable = False
+        return view
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._prices)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for attr in ("_prices", "_category_codes", "_name_ids"):
+            old = getattr(self, attr)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, attr, new)
+
+    def _write_row(self, row: int, item: "ItemData") -> None:
+        self.version += 1
+        self._items[row] = item
+        self._total += item.price - self._prices[row]
+        self._prices[row] = item.price
+        self._category_codes[row] = self.categories.code(item.category)
+        self._name_ids[row] = self.names.code(item.name)
+
+    # Mapping API
+
+    def __getitem__(self, key: str) -> "ItemData":
+        return self._items[self._index[key]]
+
+    def __setitem__(self, key: str, item: "ItemData") -> None:
+        row = self._index.get(key)
+        if row is None:
+            row = len(self._keys)
+            self._reserve(row + 1)
+            self._keys.append(key)
+            self._items.append(item)
+            self._index[key] = row
+            self._prices[row] = 0.0
+        self._write_row(row, item)
+
+    def __delitem__(self, key: str) -> None:
+        row = self._index.pop(key)
+        n = len(self._keys)
+        self._total -= self._prices[row]
+        self.version += 1
+        for column in (self._prices, self._category_codes, self._name_ids):
+            column[row:n - 1] = column[row + 1:n]
+        del self._keys[row]
+        del self._items[row]
+        for i in range(row, n - 1):
+            self._index[self._keys[i]] = i
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """Drop several items with one compaction of the columns."""
+        rows = sorted({self._index[key] for key in keys if key in self._index})
+        if not rows:
+            return
+        n = len(self._keys)
+        keep = np.ones(n, dtype=bool)
+        keep[rows] = False
+        self._total -= float(self._prices[rows].sum())
+        self.version += 1
+        m = int(keep.sum())
+        for column in (self._prices, self._category_codes, self._name_ids):
+            column[:m] = column[:n][keep]
+        self._keys = [key for key, k in zip(self._keys, keep) if k]
+        self._items = [item for item, k in zip(self._items, keep) if k]
+        self._index = {key: row for row, key in enumerate(self._keys)}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._index.clear()
+        self._items.clear()
+        self._total = 0.0
+        self.version += 1
+
+    def values(self):
+        return list(self._items)
+
+    def __repr__(self) -> str:
+        return f"ItemStore({dict(zip(self._keys, self._items))!r})"
+
+    # Editing
+
+    def update_item(self, key: str, name: Optional[str] = None, price: Optional[float] = None,
+                    category: Optional[str] = None) -> "ItemData":
+        """Change fields of one item in place (same ItemData, same id) and its columns."""
+        row = self._index[key]
+        item = self._items[row]
+        if name is not None:
+            item.name = name.strip().title()
+        if price is not None:
+            item.price = float(price)
+        if category is not None:
+            item.category = category
+        item.update_timestamp()
+        self._write_row(row, item)
+        return item
+
+    def extend(self, pairs: Iterable[Tuple[str, "ItemData"]]) -> None:
+        for key, item in pairs:
+            self[key] = item
+
+    def replace_all(self, keys: List[str], items: List["ItemData"]) -> None:
+        """Swap in a whole new item list in one pass (columns filled vectorised)."""
+        n = len(items)
+        self.clear()
+        self._reserve(n)
+        self._keys = list(keys)
+        self._items = list(items)
+        self._index = {key: row for row, key in enumerate(self._keys)}
+        self._prices[:n] = np.fromiter((it.price for it in items), dtype=np.float64, count=n)
+        self._category_codes[:n] = self.categories.encode([it.category for it in items])
+        self._name_ids[:n] = self.names.encode([it.name for it in items])
+        self._total = float(self._prices[:n].sum())
+        self.version += 1
+
+    # Vectorised Queries
+
+    def total(self) -> float:
+        """Running subtotal (O(1); resummed exactly by `recompute_total`)."""
+        return self._total
+
+    def recompute_total(self) -> float:
+        self._total = float(self.prices.sum())
+        return self._total
+
+    def argmax_price(self) -> Optional[str]:
+        """Key of the most expensive item (first one on ties)."""
+        if not self._keys:
+            return None
+        return self._keys[int(self.prices.argmax())]
+
+    def category_totals(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(categories, total price, item count) for every category present."""
+        n_codes = len(self.categories.values)
+        totals = np.bincount(self.category_codes, weights=self.prices, minlength=n_codes)
+        counts = np.bincount(self.category_codes, minlength=n_codes)
+        present = np.flatnonzero(counts)
+        return [self.categories.values[i] for i in present], totals[present], counts[present]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        name / price / category frame built from the columns. Prices are
+        copied: deletes compact the price buffer in place, which would
+        otherwise change frames handed out earlier.
+        """
+        return pd.DataFrame(
+            {
+                "name": self.names.array()[self.name_ids],
+                "price": self.prices.copy(),
+                "category": self.categories.array()[self.category_codes],
+            },
+            copy=False,
+        )
@@ -0,0 +1,406 @@
+"""
+Receipt history stored in a local SQLite database.
+
+Tables
+- receipts     : one row per confirmed receipt (date, total, subtotal)
+- items        : receipt items (name, normalised name, price, category)
+- participants : people that took part in a split
+- splits       : item → participant assignments per receipt
+
+Indexed on receipt date, item category, normalised item name and
+participant, so range aggregations never load whole receipts.
+
+Rollups (materialised, updated in the same transaction as each save)
+- rollup_day         : total / receipts / items per day
+- rollup_month       : the same per month (constant-time dashboard tiles)
+- rollup_category    : per day and category
+- rollup_participant : per day and participant (normalised name)
+
+Receipts are keyed by `history_key(receipt)`: a uuid4 stored in
+`receipt.meta` on first save. `receipt.id` comes from a per-process
+counter and repeats across restarts, so it must not key history rows
+(participant rows are likewise keyed "<history key>/<participant id>").
+
+A save subtracts the receipt's previous contribution (if any) and adds
+the new one, so dashboard queries read at most one row per day and
+category instead of every item.
+
+All database work runs on one background thread that owns the
+connection; every public method returns a `concurrent.futures.Future`.
+If the database cannot be opened, every pending and later Future fails
+with that error instead of never resolving; callers wait at most
+QUERY_TIMEOUT_S.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from modules.data.name_index import normalize as normalize_name
+from modules.data.receipt_data import ReceiptData
+
+
+DB_PATH = os.getenv("HISTORY_DB_PATH", os.path.join("data", "history.sqlite3"))
+QUERY_TIMEOUT_S = float(os.getenv("HISTORY_TIMEOUT_S", "10"))  # max wait on a result in the UI
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (
+    id        TEXT PRIMARY KEY,
+    date      TEXT NOT NULL,      -- YYYY-MM-DD
+    total     REAL NOT NULL,
+    subtotal  REAL NOT NULL,
+    n_items   INTEGER NOT NULL,
+    meta      TEXT,
+    saved_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    receipt_id TEXT NOT NULL REFERENCES receipts(id) ON DELETE CASCADE,
+    item_id    TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    norm_name  TEXT NOT NULL,
+    price      REAL NOT NULL,
+    category   TEXT NOT NULL,
+    PRIMARY KEY (receipt_id, item_id)
+);
+CREATE TABLE IF NOT EXISTS participants (
+    id        TEXT PRIMARY KEY,
+    name      TEXT NOT NULL,
+    norm_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS splits (
+    receipt_id     TEXT NOT NULL REFERENCES receipts(id) ON DELETE CASCADE,
+    participant_id TEXT NOT NULL REFERENCES participants(id),
+    item_id        TEXT NOT NULL,
+    assigned_count INTEGER NOT NULL,
+    amount         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_receipts_date ON receipts(date);
+CREATE INDEX IF NOT EXISTS idx_items_category ON items(category);
+CREATE INDEX IF NOT EXISTS idx_items_norm_name ON items(norm_name);
+CREATE INDEX IF NOT EXISTS idx_participants_norm_name ON participants(norm_name);
+CREATE INDEX IF NOT EXISTS idx_splits_participant ON splits(participant_id);
+CREATE INDEX IF NOT EXISTS idx_splits_receipt ON splits(receipt_id);
+CREATE INDEX IF NOT EXISTS idx_items_price ON items(price);
+
+CREATE TABLE IF NOT EXISTS rollup_day (
+    day TEXT PRIMARY KEY, total REAL NOT NULL, n_receipts INTEGER NOT NULL, n_items INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_month (
+    month TEXT PRIMARY KEY, total REAL NOT NULL, n_receipts INTEGER NOT NULL, n_items INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_category (
+    day TEXT NOT NULL, category TEXT NOT NULL, total REAL NOT NULL, n_items INTEGER NOT NULL,
+    PRIMARY KEY (day, category)
+);
+CREATE TABLE IF NOT EXISTS rollup_participant (
+    day TEXT NOT NULL, norm_name TEXT NOT NULL, name TEXT NOT NULL, total REAL NOT NULL,
+    n_receipts INTEGER NOT NULL,
+    PRIMARY KEY (day, norm_name)
+);
+"""
+SCHEMA_VERSION = 2  # 2: rollup tables (backfilled from existing receipts on upgrade)
+
+# Add (:sign = 1) or remove (:sign = -1) one receipt's contribution to every rollup
+ROLLUP_DELTAS = [
+    """INSERT INTO rollup_day (day, total, n_receipts, n_items)
+       SELECT date, :sign * total, :sign, :sign * n_items FROM receipts WHERE id = :rid
+       ON CONFLICT(day) DO UPDATE SET total = total + excluded.total,
+           n_receipts = n_receipts + excluded.n_receipts, n_items = n_items + excluded.n_items""",
+    """INSERT INTO rollup_month (month, total, n_receipts, n_items)
+       SELECT substr(date, 1, 7), :sign * total, :sign, :sign * n_items FROM receipts WHERE id = :rid
+       ON CONFLICT(month) DO UPDATE SET total = total + excluded.total,
+           n_receipts = n_receipts + excluded.n_receipts, n_items = n_items + excluded.n_items""",
+    """INSERT INTO rollup_category (day, category, total, n_items)
+       SELECT r.date, i.category, :sign * SUM(i.price), :sign * COUNT(*)
+       FROM items i JOIN receipts r ON r.id = i.receipt_id WHERE i.receipt_id = :rid
+       GROUP BY i.category
+       ON CONFLICT(day, category) DO UPDATE SET total = total + excluded.total,
+           n_items = n_items + excluded.n_items""",
+    """INSERT INTO rollup_participant (day, norm_name, name, total, n_receipts)
+       SELECT r.date, p.norm_name, MIN(p.name), :sign * SUM(s.amount), :sign
+       FROM splits s JOIN receipts r ON r.id = s.receipt_id JOIN participants p ON p.id = s.participant_id
+       WHERE s.receipt_id = :rid
+       GROUP BY p.norm_name
+       ON CONFLICT(day, norm_name) DO UPDATE SET total = total + excluded.total,
+           n_receipts = n_receipts + excluded.n_receipts""",
+]
+# Drop rows that reached zero after a subtraction (only the receipt's own day/month)
+ROLLUP_CLEANUP = [
+    "DELETE FROM rollup_day WHERE day = :day AND n_receipts <= 0",
+    "DELETE FROM rollup_month WHERE month = substr(:day, 1, 7) AND n_receipts <= 0",
+    "DELETE FROM rollup_category WHERE day = :day AND n_items <= 0",
+    "DELETE FROM rollup_participant WHERE day = :day AND n_receipts <= 0",
+]
+
+
+def history_key(receipt: ReceiptData) -> str:
+    """Globally unique history key of a receipt (uuid4 kept in its meta, set on first use)."""
+    key = receipt.meta.get("history_key")
+    if not key:
+        key = receipt.meta["history_key"] = uuid.uuid4().hex
+    return key
+
+
+def _receipt_date(receipt: ReceiptData) -> str:
+    try:
+        return datetime.fromisoformat(receipt.created_at).date().isoformat()
+    except (TypeError, ValueError):
+        return datetime.now().date().isoformat()
+
+
+# History Store
+
+class HistoryStore:
+    """SQLite history with a single worker thread (connections are thread-bound)."""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self.revision = 0  # bumped on every write (lets callers cache derived data)
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._submit_lock = threading.Lock()
+        self._failed: Optional[BaseException] = None  # set when the worker could not start
+        self._worker = threading.Thread(target=self._loop, name="history-store", daemon=True)
+        self._worker.start()
+
+    # Worker
+
+    def _connect(self) -> sqlite3.Connection:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with conn:
+                receipt_ids = [row[0] for row in conn.execute("SELECT id FROM receipts")]
+                for receipt_id in receipt_ids:
+                    _apply_rollups(conn, receipt_id, 1)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            print(f"History rollups built for {len(receipt_ids)} receipts.")
+        return conn
+
+    def _loop(self) -> None:
+        try:
+            conn = self._connect()
+        except Exception as e:
+            print(f"History store unavailable: {e}")
+            self._fail_pending(e)
+            return
+        while True:
+            fn, future = self._jobs.get()
+            if fn is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(conn))
+            except Exception as e:
+                conn.rollback()
+                future.set_exception(e)
+        conn.close()
+
+    def _fail_pending(self, error: BaseException) -> None:
+        """Fail every queued job, and (via `_failed`) every later one."""
+        with self._submit_lock:
+            self._failed = error
+        while True:
+            try:
+                _, future = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """Run `fn(conn)` on the store thread."""
+        future: Future = Future()
+        with self._submit_lock:
+            if self._failed is None:
+                self._jobs.put((fn, future))
+                return future
+        future.set_exception(self._failed)
+        return future
+
+    def close(self) -> None:
+        if self._worker.is_alive():
+            self._jobs.put((None, None))
+        self._worker.join()
+
+    # Writes
+
+    def save_receipt(self, receipt: ReceiptData, manager=None, date: Optional[str] = None) -> Future:
+        """Insert or replace a receipt, its items and (optionally) its split, in one transaction."""
+        date = date or _receipt_date(receipt)
+        rid = history_key(receipt)
+        items = [
+            (rid, key, it.name, normalize_name(it.name), it.price, it.category)
+            for key, it in receipt.items.items()
+        ]
+        item_keys = {it.id: key for key, it in receipt.items.items()}
+
+        participants, splits = [], []
+        if manager is not None:
+            for pid, p in manager.participants.items():
+                hpid = f"{rid}/{pid}"  # participant ids are per-process too: scope them to the receipt
+                participants.append((hpid, p.name, normalize_name(p.name)))
+                for a in manager.get_assignments(pid):
+                    key = item_keys.get(a.item.id)
+                    if key is not None:
+                        splits.append((rid, hpid, key, a.assigned_count, a.total_price))
+
+        row = (rid, date, receipt.total, receipt.subtotal, len(items),
+               json.dumps(receipt.meta, default=str), datetime.now().isoformat())
+
+        def _write(conn: sqlite3.Connection) -> int:
+            with conn:
+                _apply_rollups(conn, rid, -1)  # previous version of this receipt, if any
+                conn.execute("DELETE FROM receipts WHERE id = ?", (rid,))  # cascades
+                conn.execute("INSERT INTO receipts VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+                conn.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)", items)
+                conn.executemany(
+                    "INSERT INTO participants VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET name = excluded.name, norm_name = excluded.norm_name",
+                    participants,
+                )
+                conn.executemany("INSERT INTO splits VALUES (?, ?, ?, ?, ?)", splits)
+                _apply_rollups(conn, rid, 1)
+            return len(items)
+
+        self.revision += 1
+        return self.submit(_write)
+
+    def delete_receipt(self, receipt_id: str) -> Future:
+        """Delete one receipt by its history key (see `history_key`)."""
+        def _delete(conn: sqlite3.Connection) -> None:
+            with conn:
+                _apply_rollups(conn, receipt_id, -1)
+                conn.execute("DELETE FROM receipts WHERE id = ?", (receipt_id,))
+        self.revision += 1
+        return self.submit(_delete)
+
+    # Queries (aggregated in SQL, only results cross the thread)
+
+    def query_df(self, sql: str, params: tuple = ()) -> Future:
+        return self.submit(lambda conn: pd.read_sql_query(sql, conn, params=params))
+
+    def summary(self, start: str, end: str) -> Future:
+        """Receipt count, total spent and item count between two dates (inclusive)."""
+        return self.query_df(
+            "SELECT COALESCE(SUM(n_receipts), 0) AS num_receipts, COALESCE(SUM(total), 0) AS total_spent, "
+            "COALESCE(SUM(n_items), 0) AS num_items "
+            "FROM rollup_day WHERE day BETWEEN ? AND ?",
+            (start, end),
+        )
+
+    def category_totals(self, start: str, end: str) -> Future:
+        return self.query_df(
+            "SELECT category, SUM(total) AS total_spent, SUM(n_items) AS item_count "
+            "FROM rollup_category WHERE day BETWEEN ? AND ? "
+            "GROUP BY category ORDER BY total_spent DESC",
+            (start, end),
+        )
+
+    def monthly_totals(self, start: str, end: str) -> Future:
+        return self.query_df(
+            "SELECT substr(day, 1, 7) AS month, SUM(total) AS total_spent, SUM(n_receipts) AS num_receipts "
+            "FROM rollup_day WHERE day BETWEEN ? AND ? GROUP BY month ORDER BY month",
+            (start, end),
+        )
+
+    def month_tile(self, month: str) -> Future:
+        """{total, n_receipts, n_items} for one month (YYYY-MM): a single primary-key lookup."""
+        def _tile(conn: sqlite3.Connection) -> dict:
+            row = conn.execute(
+                "SELECT total, n_receipts, n_items FROM rollup_month WHERE month = ?", (month,)
+            ).fetchone()
+            total, n_receipts, n_items = row or (0.0, 0, 0)
+            return {"total": total, "n_receipts": n_receipts, "n_items": n_items}
+        return self.submit(_tile)
+
+    def top_items(self, start: str, end: str, limit: int = 10) -> Future:
+        """Most expensive single items in the range."""
+        return self.query_df(
+            "SELECT i.name AS name, i.price AS price, i.category AS category, r.date AS date "
+            "FROM receipts r JOIN items i ON i.receipt_id = r.id "
+            "WHERE r.date BETWEEN ? AND ? ORDER BY i.price DESC LIMIT ?",
+            (start, end, limit),
+        )
+
+    def item_history(self, name: str) -> Future:
+        """Price history of one item (by normalised name)."""
+        return self.query_df(
+            "SELECT r.date AS date, i.price AS price, i.category AS category "
+            "FROM items i JOIN receipts r ON r.id = i.receipt_id "
+            "WHERE i.norm_name = ? ORDER BY r.date",
+            (normalize_name(name),),
+        )
+
+    def participant_totals(self, start: str, end: str) -> Future:
+        """Spending per person; participants are matched across receipts by normalised name."""
+        return self.query_df(
+            "SELECT MIN(name) AS participant, SUM(total) AS total_spent, SUM(n_receipts) AS num_receipts "
+            "FROM rollup_participant WHERE day BETWEEN ? AND ? "
+            "GROUP BY norm_name ORDER BY total_spent DESC",
+            (start, end),
+        )
+
+    def preference_counts(self) -> Future:
+        """
+        Per (participant, item) normalised name pair: receipts where the
+        person took that item (`chosen`) and receipts where both were
+        present (`seen`). Only receipts saved with a split count.
+        """
+        return self.query_df(
+            "WITH present AS ("
+            "  SELECT DISTINCT s.receipt_id, p.norm_name FROM splits s "
+            "  JOIN participants p ON p.id = s.participant_id"
+            "), chosen AS ("
+            "  SELECT p.norm_name AS participant, i.norm_name AS item, COUNT(DISTINCT s.receipt_id) AS chosen "
+            "  FROM splits s JOIN participants p ON p.id = s.participant_id "
+            "  JOIN items i ON i.receipt_id = s.receipt_id AND i.item_id = s.item_id "
+            "  GROUP BY p.norm_name, i.norm_name"
+            ") "
+            "SELECT pr.norm_name AS participant, i.norm_name AS item, "
+            "COUNT(DISTINCT i.receipt_id) AS seen, COALESCE(MAX(c.chosen), 0) AS chosen "
+            "FROM present pr JOIN items i ON i.receipt_id = pr.receipt_id "
+            "LEFT JOIN chosen c ON c.participant = pr.norm_name AND c.item = i.norm_name "
+            "GROUP BY pr.norm_name, i.norm_name"
+        )
+
+
+def _apply_rollups(conn: sqlite3.Connection, receipt_id: str, sign: int) -> None:
+    """Add or subtract one receipt in all rollup tables (caller holds the transaction)."""
+    row = conn.execute("SELECT date FROM receipts WHERE id = ?", (receipt_id,)).fetchone()
+    if row is None:
+        return
+    params = {"sign": sign, "rid": receipt_id}
+    for sql in ROLLUP_DELTAS:
+        conn.execute(sql, params)
+    if sign < 0:
+        for sql in ROLLUP_CLEANUP:
+            conn.execute(sql, {"day": row[0]})
+
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """History store shared by all sessions (created on first use)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore()
+    return _store
@@ -0,0 +1,130 @@
+"""
+Fuzzy item-name index used by SplitManager to resolve names to items.
+
+Names are normalised (lower case, single spaces) and indexed by word
+trigrams ("tea" → " te", "tea", "ea "). A lookup only scores items that
+share at least one trigram with the query, then picks the best one by:
+
+    score = Jaccard(trigrams) · 0.7 + share of query words found whole · 0.3
+
+Ties go to the item indexed first, so results are deterministic. Short
+partial overlaps score low: "tea" vs "Steak" shares one trigram out of
+seven (score 0.1), below the default threshold of 0.3.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+MATCH_THRESHOLD = 0.3
+TRIGRAM_WEIGHT = 0.7
+TOKEN_WEIGHT = 0.3
+
+
+def normalize(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+def _trigrams(tokens: Iterable[str]) -> Set[str]:
+    grams = set()
+    for token in tokens:
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """Trigram + token index over item names, updatable per item."""
+
+    def __init__(self):
+        self._names: Dict[str, str] = {}              # item id → normalised name
+        self._grams: Dict[str, Set[str]] = {}         # item id → trigrams
+        self._tokens: Dict[str, Set[str]] = {}        # item id → words
+        self._order: Dict[str, int] = {}              # item id → insertion rank (tie-break)
+        self._postings: Dict[str, Set[str]] = {}      # trigram → item ids
+        self._next_rank = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._names
+
+    # Updates
+
+    def add(self, item_id: str, name: str) -> None:
+        """Index (or re-index after a rename) one item."""
+        norm = normalize(name)
+        if self._names.get(item_id) == norm:
+            return
+        if item_id in self._names:
+            self._unpost(item_id)
+        else:
+            self._order[item_id] = self._next_rank
+            self._next_rank += 1
+
+        tokens = set(norm.split())
+        grams = _trigrams(tokens)
+        self._names[item_id] = norm
+        self._tokens[item_id] = tokens
+        self._grams[item_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(item_id)
+
+    def remove(self, item_id: str) -> None:
+        if item_id not in self._names:
+            return
+        self._unpost(item_id)
+        del self._names[item_id], self._tokens[item_id], self._grams[item_id], self._order[item_id]
+
+    def _unpost(self, item_id: str) -> None:
+        for gram in self._grams[item_id]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def sync(self, items: Dict[str, str]) -> int:
+        """
+        Make the index match `items` (item id → name), touching only
+        added, renamed and removed items. Returns the number of changes.
+        """
+        changes = 0
+        for item_id in [i for i in self._names if i not in items]:
+            self.remove(item_id)
+            changes += 1
+        for item_id, name in items.items():
+            if self._names.get(item_id) != normalize(name):
+                self.add(item_id, name)
+                changes += 1
+        return changes
+
+    # Lookup
+
+    def search(self, query: str, limit: int = 5, threshold: float = MATCH_THRESHOLD) -> List[Tuple[str, float]]:
+        """Best (item id, score) pairs for `query`, highest score first."""
+        tokens = set(normalize(query).split())
+        grams = _trigrams(tokens)
+        if not grams:
+            return []
+
+        # Only items sharing a trigram with the query are scored
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        scored = []
+        for item_id, common in shared.items():
+            jaccard = common / (len(grams) + len(self._grams[item_id]) - common)
+            token_share = len(tokens & self._tokens[item_id]) / len(tokens)
+            score = TRIGRAM_WEIGHT * jaccard + TOKEN_WEIGHT * token_share
+            if score >= threshold:
+                scored.append((-score, self._order[item_id], item_id))
+
+        scored.sort()
+        return [(item_id, -neg) for neg, _, item_id in scored[:limit]]
+
+    def best_match(self, query: str, threshold: float = MATCH_THRESHOLD) -> Optional[str]:
+        hits = self.search(query, limit=1, threshold=threshold)
+        return hits[0][0] if hits else None
@@ -0,0 +1,127 @@
+"""
+Who usually takes what, learned from past confirmed splits.
+
+For every (participant, item) pair of normalised names seen in history:
+- chosen : receipts where that person was assigned the item
+- seen   : receipts where the person took part and the item was ordered
+
+are kept as two dense uint32 matrices (people × item names), with the
+name → row / column lookups held in pandas Indexes. Scoring a new
+receipt is one `get_indexer` per axis plus one fancy-indexing gather:
+
+    support = chosen / seen   (0 when never seen together)
+
+The index is rebuilt from the history store only when its revision
+changes, on a background thread (see `get_preference_index`).
+"""
+
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from modules.data.history_store import QUERY_TIMEOUT_S, HistoryStore, get_history_store
+from modules.data.name_index import normalize
+
+
+MIN_SUPPORT = 0.5  # took the item in at least half the receipts they shared with it
+
+
+class PreferenceIndex:
+    """participant name × item name → how often the person took the item."""
+
+    def __init__(self, participants: Sequence[str], items: Sequence[str], chosen: np.ndarray, seen: np.ndarray):
+        self.participants = pd.Index(participants)
+        self.items = pd.Index(items)
+        self.chosen = chosen
+        self.seen = seen
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "PreferenceIndex":
+        """Build from `HistoryStore.preference_counts()` rows (participant, item, seen, chosen)."""
+        rows, participants = pd.factorize(df["participant"])
+        cols, items = pd.factorize(df["item"])
+        chosen = np.zeros((len(participants), len(items)), dtype=np.uint32)
+        seen = np.zeros_like(chosen)
+        chosen[rows, cols] = df["chosen"].to_numpy()
+        seen[rows, cols] = df["seen"].to_numpy()
+        return cls(participants, items, chosen, seen)
+
+    def __len__(self) -> int:
+        return len(self.participants)
+
+    def support(self, participant_names: Sequence[str], item_names: Sequence[str]) -> np.ndarray:
+        """(people × items) share of shared receipts in which each person took each item."""
+        rows = self.participants.get_indexer([normalize(n) for n in participant_names])
+        cols = self.items.get_indexer([normalize(n) for n in item_names])
+        scores = np.zeros((len(rows), len(cols)), dtype=np.float64)
+        if not len(self.participants) or not len(self.items):
+            return scores
+
+        # Unknown names come back as -1: gather with 0 and mask afterwards
+        known = (rows >= 0)[:, None] & (cols >= 0)[None, :]
+        grid = np.ix_(np.maximum(rows, 0), np.maximum(cols, 0))
+        seen = self.seen[grid]
+        np.divide(self.chosen[grid], seen, out=scores, where=known & (seen > 0))
+        return scores
+
+    def suggest_weights(self, participant_names: Sequence[str], item_names: Sequence[str],
+                        min_support: float = MIN_SUPPORT) -> np.ndarray:
+        """1 for every (person, item) the person usually takes; items nobody usually takes stay empty."""
+        return (self.support(participant_names, item_names) >= min_support).astype(np.float64)
+
+
+# Shared Index
+
+_index: Optional[PreferenceIndex] = None
+_index_revision: Optional[tuple] = None
+_building: Optional[tuple] = None  # revision the running background rebuild is working on
+_builder: Optional[threading.Thread] = None
+_index_lock = threading.Lock()
+
+
+def _empty_index() -> PreferenceIndex:
+    return PreferenceIndex([], [], np.zeros((0, 0), dtype=np.uint32), np.zeros((0, 0), dtype=np.uint32))
+
+
+def _rebuild(store: HistoryStore, revision: tuple) -> None:
+    """Aggregate history off the UI thread and swap the new index in."""
+    global _index, _index_revision, _building
+    try:
+        index = PreferenceIndex.from_frame(store.preference_counts().result(timeout=QUERY_TIMEOUT_S))
+    except Exception as e:
+        print(f"Preference index rebuild failed: {e}")
+        index = None
+    with _index_lock:
+        if index is not None:
+            _index, _index_revision = index, revision
+        _building = None
+
+
+def get_preference_index(store: Optional[HistoryStore] = None) -> PreferenceIndex:
+    """
+    Preference index for the history store. After history changes the
+    previous index is served while a rebuild runs in the background;
+    only the very first call (nothing to serve yet) waits for it.
+    """
+    global _building, _builder
+    store = store or get_history_store()
+    revision = (id(store), store.revision)
+    with _index_lock:
+        if _index_revision == revision:
+            return _index
+        if _building is None:  # one rebuild at a time; a newer revision is picked up by the next call
+            _building = revision
+            _builder = threading.Thread(target=_rebuild, args=(store, revision),
+                                        name="preference-index", daemon=True)
+            _builder.start()
+        builder = _builder
+        if _index is not None and _index_revision[0] == id(store):
+            return _index  # previous revision of the same store
+
+    builder.join(timeout=QUERY_TIMEOUT_S)
+    with _index_lock:
+        if _index is not None and _index_revision[0] == id(store):
+            return _index
+    return _empty_index()
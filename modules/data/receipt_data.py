@@ -2,26 +2,36 @@ from dataclasses import dataclass, field
 from typing import Dict, List
 import pandas as pd
 
-from modules.data.base import BaseEntity
+from modules.data.base import BaseEntity, CompactEntity
+from modules.data.columnar import ItemStore
 from modules.models.classifier import auto_tag
+from modules.models.learned_classifier import predict_categories
 
 
 # Item Data
 
-@dataclass
-class ItemData(BaseEntity):
-    """Represent a single item in a receipt."""
+class ItemData(CompactEntity):
+    """Represent a single item in a receipt (slotted: no per-item __dict__)."""
 
-    name: str
-    price: float
-    category: str = "Others"
+    __slots__ = ("name", "price", "category")
+    id_prefix = "item"
 
     def __init__(self, name: str, price: float, category: str = None):
-        super().__init__(prefix="item")
+        super().__init__()
         self.name = name.strip().title()
         self.price = float(price)
         self.category = category or auto_tag(self.name)
 
+    def __repr__(self) -> str:
+        return f"ItemData(name={self.name!r}, price={self.price!r}, category={self.category!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ItemData):
+            return NotImplemented
+        return (self.id, self.name, self.price, self.category) == (other.id, other.name, other.price, other.category)
+
+    __hash__ = None  # mutable, like the former dataclass
+
     def to_dict(self) -> dict:
         """Convert item to dictionary."""
         base = super().to_dict()
@@ -32,14 +42,22 @@ class ItemData(BaseEntity):
         })
         return base
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "ItemData":
+        """Recreate item from to_dict() output."""
+        item = cls(data.get("name", ""), data.get("price", 0), data.get("category"))
+        for key in ("id", "created_at", "updated_at"):
+            if data.get(key):
+                setattr(item, key, data[key])
+        return item
+
 
 #  Receipt Data
 
-@dataclass
+@dataclass(eq=False, repr=False)
 class ReceiptData(BaseEntity):
     """Structure for receipts parsed by AI or user-edited."""
 
-    items: Dict[str, ItemData] = field(default_factory=dict)
     total: float = 0.0
     meta: dict = field(default_factory=dict)
 
@@ -48,13 +66,50 @@ class ReceiptData(BaseEntity):
         self.items = items
         self.total = float(total)
         self.meta = {}
+        self._next_key = len(self.items) + 1
+
+    # Item Storage (columnar, dict-style facade)
+
+    @property
+    def items(self) -> ItemStore:
+        return self._items
+
+    @items.setter
+    def items(self, items: Dict[str, ItemData]) -> None:
+        self._items = items if isinstance(items, ItemStore) else ItemStore(items)
+
+    # `items` is a property, not a dataclass field: compare / show it explicitly
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ReceiptData):
+            return NotImplemented
+        return (
+            (self.id, self.created_at, self.updated_at, self.total, self.meta)
+            == (other.id, other.created_at, other.updated_at, other.total, other.meta)
+            and dict(self.items.items()) == dict(other.items.items())
+        )
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (
+            f"ReceiptData(id={self.id!r}, created_at={self.created_at!r}, updated_at={self.updated_at!r}, "
+            f"items={self.items!r}, total={self.total!r}, meta={self.meta!r})"
+        )
+
+    def __setstate__(self, state: dict) -> None:
+        # Pickles from before ItemStore hold a plain `items` dict
+        items = state.pop("items", None)
+        self.__dict__.update(state)
+        if items is not None:
+            self.items = items
 
     # Basic Computation
 
     @property
     def subtotal(self) -> float:
-        """Sum of all item prices (pre-tax)."""
-        return round(sum(it.price for it in self.items.values()), 2)
+        """Sum of all item prices (pre-tax), kept as a running total."""
+        return round(self.items.total(), 2)
 
     def recalculate_total(self):
         """Recalculate total (auto-update after edits)."""
@@ -63,31 +118,117 @@ class ReceiptData(BaseEntity):
 
     # Editing Helpers
 
+    def _new_key(self) -> str:
+        """Next free item key (counter survives deletes, unlike len(items))."""
+        n = getattr(self, "_next_key", len(self.items) + 1)
+        while f"item_{n:03d}" in self.items:
+            n += 1
+        self._next_key = n + 1
+        return f"item_{n:03d}"
+
     def add_item(self, name: str, price: float, category: str = None):
         """Add new item safely."""
-        idx = len(self.items) + 1
-        item_id = f"item_{idx:03d}"
-        self.items[item_id] = ItemData(name, price, category or auto_tag(name))
+        self.items[self._new_key()] = ItemData(name, price, category or auto_tag(name))
+        self.recalculate_total()
+
+    def remove_item(self, key: str):
+        """Remove one item and refresh the total."""
+        del self.items[key]
+        self.recalculate_total()
+
+    def update_item(self, key: str, name: str = None, price: float = None, category: str = None) -> ItemData:
+        """Edit one item in place (keeps its id) and refresh the total."""
+        item = self.items.update_item(key, name=name, price=price, category=category)
+        self.recalculate_total()
+        return item
+
+    def apply_edits(self, keys: List[str], edited_rows: Dict = None, added_rows: List[dict] = None,
+                    deleted_rows: List[int] = None) -> dict:
+        """
+        Patch items with a st.data_editor edit delta.
+
+        Row positions in the delta refer to `keys` (the item keys of the frame
+        given to the editor). Untouched items are left as they are (same
+        ItemData, same id); cost grows with the number of edits only.
+        Returns the updated/added item keys, ids of deleted items and the
+        (name, category) pairs the user set explicitly.
+        """
+        deleted_keys = [keys[int(pos)] for pos in (deleted_rows or []) if keys[int(pos)] in self.items]
+        deleted_set = set(deleted_keys)
+        result = {"updated": [], "added": [], "deleted": [], "corrections": []}
+
+        for pos, changes in (edited_rows or {}).items():
+            key = keys[int(pos)]
+            if key in deleted_set or key not in self.items:
+                continue
+            fields = {}
+            if "name" in changes:
+                fields["name"] = str(changes["name"] or "")
+            if "price" in changes:
+                fields["price"] = float(changes["price"] or 0)
+            if "category" in changes:
+                fields["category"] = str(changes["category"] or "").strip() or None
+                if fields["category"] is None:
+                    fields["category"] = auto_tag(fields.get("name", self.items[key].name))
+            item = self.items.update_item(key, **fields)
+            result["updated"].append(key)
+            if "category" in changes and changes["category"]:
+                result["corrections"].append((item.name, item.category))
+
+        result["deleted"] = [self.items[key].id for key in deleted_keys]
+        self.items.delete_many(deleted_keys)
+
+        rows = [r for r in (added_rows or []) if any(v not in (None, "") for v in r.values())]
+        if rows:
+            names = [str(r.get("name") or "") for r in rows]
+            missing = [i for i, r in enumerate(rows) if not r.get("category")]
+            predicted = dict(zip(missing, predict_categories([names[i] for i in missing])))
+            for i, r in enumerate(rows):
+                key = self._new_key()
+                self.items[key] = ItemData(names[i], float(r.get("price") or 0), r.get("category") or predicted[i])
+                result["added"].append(key)
+                if r.get("category"):
+                    result["corrections"].append((self.items[key].name, r["category"]))
+
+        self.recalculate_total()
+        return result
+
+    def replace_items(self, df: pd.DataFrame):
+        """
+        Replace all items with the rows of `df` (name / price / category) in one pass.
+        Columns are read vectorised; rows without a category are tagged in one batch.
+        """
+        n = len(df)
+        names = df["name"].fillna("").astype(str).str.strip().tolist() if "name" in df else [""] * n
+        prices = (
+            pd.to_numeric(df["price"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+            if "price" in df else [0.0] * n
+        )
+        categories = (
+            df["category"].fillna("").astype(str).str.strip().tolist() if "category" in df else [""] * n
+        )
+
+        missing = [i for i, c in enumerate(categories) if not c]
+        for i, tag in zip(missing, predict_categories([names[i] for i in missing])):
+            categories[i] = tag
+
+        items = [ItemData(name, price, category) for name, price, category in zip(names, prices, categories)]
+        keys = [f"item_{i:03d}" for i in range(1, n + 1)]
+        self.items.replace_all(keys, items)
+        self._next_key = n + 1
         self.recalculate_total()
 
     def update_from_dataframe(self, df: pd.DataFrame):
         """Update items from edited DataFrame (used by Streamlit editor)."""
-        self.items.clear()
-        for i, row in df.iterrows():
-            self.add_item(
-                name=str(row.get("name", "")).strip(),
-                price=float(row.get("price", 0)),
-                category=str(row.get("category", "Others")).strip()
-            )
-        self.recalculate_total()
+        self.replace_items(df)
 
     # Data Conversions
 
     def to_dataframe(self) -> pd.DataFrame:
         """Convert receipt to pandas DataFrame."""
-        df = pd.DataFrame([i.to_dict() for i in self.items.values()])
+        df = self.items.to_dataframe()
         df["receipt_id"] = self.id
-        return df[["name", "price", "category", "receipt_id"]]
+        return df
 
     def to_dict(self) -> dict:
         """Convert receipt to dictionary (JSON-friendly)."""
@@ -102,11 +243,14 @@ class ReceiptData(BaseEntity):
     @classmethod
     def from_list(cls, data: List[dict], total: float) -> "ReceiptData":
         """Build ReceiptData from list of {name, price, category}."""
+        # Rows without a category are classified in one batch (learned model → rules)
+        missing = [i for i, d in enumerate(data) if not d.get("category")]
+        predicted = dict(zip(missing, predict_categories([str(data[i].get("name", "")) for i in missing])))
         items = {
             f"item_{i:03d}": ItemData(
                 d.get("name", ""),
                 d.get("price", 0),
-                d.get("category", "Others")
+                d.get("category") or predicted[i]
             )
             for i, d in enumerate(data)
         }
@@ -116,18 +260,20 @@ class ReceiptData(BaseEntity):
 
     def get_most_expensive(self) -> ItemData:
         """Return the most expensive item."""
-        return max(self.items.values(), key=lambda x: x.price)
+        key = self.items.argmax_price()
+        if key is None:
+            raise ValueError("Receipt has no items")
+        return self.items[key]
 
     def get_category_summary(self) -> pd.DataFrame:
         """Summarize total spending by category."""
-        df = self.to_dataframe()
+        categories, totals, _ = self.items.category_totals()
         summary = (
-            df.groupby("category")[["price"]]
-            .sum()
-            .sort_values("price", ascending=False)
-            .reset_index()
+            pd.DataFrame({"category": categories, "total_spent": totals})
+            .sort_values("category")
+            .sort_values("total_spent", ascending=False, kind="stable")
+            .reset_index(drop=True)
         )
-        summary.rename(columns={"price": "total_spent"}, inplace=True)
         return summary
 
     def get_percentage_breakdown(self) -> pd.DataFrame:
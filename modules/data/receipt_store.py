@@ -0,0 +1,169 @@
+"""
+Versioned on-disk store for the latest receipt.
+
+File format (`data/latest_receipt.jsonl`, JSON lines):
+    line 1 : header  {"schema": 1, "digest": ..., "id", "total", "meta", ...}
+    line 2 : columns {"keys": [...], "ids": [...], "name": [...], "price": [...], ...}
+
+Items are stored column-wise so a load is two `json.loads` calls plus one
+bulk ItemStore fill. Writes go to a temp file that is renamed over the
+target (atomic on POSIX and Windows) and are skipped when the content
+digest matches what is already on disk.
+
+The old `data/temp_receipt.pkl` (a pickled ReceiptData or its `to_dict()`)
+is still read when no store file exists, and migrated on first load.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+from modules.data.receipt_data import ItemData, ReceiptData
+
+
+SCHEMA_VERSION = 1
+STORE_PATH = os.path.join("data", "latest_receipt.jsonl")
+LEGACY_PICKLE_PATH = os.path.join("data", "temp_receipt.pkl")
+
+_lock = threading.Lock()
+_known: Dict[str, Tuple[str, int]] = {}  # path → (digest, mtime_ns) last written or read here
+_fingerprints: Dict[str, tuple] = {}      # path → fingerprint of the receipt object last saved
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Encoding
+
+def _encode(receipt: ReceiptData) -> Tuple[str, str]:
+    """Return (digest, file content) for a receipt."""
+    items = list(receipt.items.values())
+    columns = {
+        "keys": list(receipt.items.keys()),
+        "ids": [it.id for it in items],
+        "created_ts": [it.created_ts for it in items],
+        "updated_ts": [it.updated_ts for it in items],
+        "name": [it.name for it in items],
+        "price": receipt.items.prices.tolist(),
+        "category": [it.category for it in items],
+    }
+    body = {
+        "id": receipt.id,
+        "created_at": receipt.created_at,
+        "updated_at": receipt.updated_at,
+        "total": receipt.total,
+        "meta": receipt.meta,
+        "next_key": getattr(receipt, "_next_key", len(items) + 1),
+        "n_items": len(items),
+    }
+    columns_line = json.dumps(columns, ensure_ascii=False, separators=(",", ":"), default=str)
+    body_line = json.dumps(body, ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=str)
+    digest = hashlib.sha1(f"{body_line}\n{columns_line}".encode("utf-8")).hexdigest()
+
+    header = json.dumps({"schema": SCHEMA_VERSION, "digest": digest, **body},
+                        ensure_ascii=False, separators=(",", ":"), default=str)
+    return digest, f"{header}\n{columns_line}\n"
+
+
+def _decode(header: dict, columns: dict) -> ReceiptData:
+    """Rebuild a ReceiptData from the header and column lines."""
+    if header.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported receipt schema {header.get('schema')!r}")
+
+    items = []
+    for name, price, category, item_id, created, updated in zip(
+        columns["name"], columns["price"], columns["category"],
+        columns["ids"], columns["created_ts"], columns["updated_ts"],
+    ):
+        item = ItemData(name, price, category)
+        item.id, item.created_ts, item.updated_ts = item_id, created, updated
+        items.append(item)
+
+    receipt = ReceiptData(items={}, total=header.get("total", 0.0))
+    receipt.items.replace_all(columns["keys"], items)
+    # receipt.id stays the fresh in-process id: stored ids repeat across restarts
+    # (the global history key travels in meta)
+    receipt.created_at = header.get("created_at", receipt.created_at)
+    receipt.updated_at = header.get("updated_at", receipt.updated_at)
+    receipt.meta = header.get("meta") or {}
+    receipt._next_key = header.get("next_key", len(items) + 1)
+    return receipt
+
+
+def _fingerprint(receipt: ReceiptData) -> tuple:
+    """Cheap change marker: same item store object, same mutation count, same header."""
+    return (id(receipt.items), receipt.items.version, receipt.id, receipt.total, receipt.updated_at,
+            json.dumps(receipt.meta, sort_keys=True, default=str))
+
+
+def _from_legacy(data) -> Optional[ReceiptData]:
+    """temp_receipt.pkl held either a ReceiptData or its to_dict()."""
+    if isinstance(data, ReceiptData):
+        return data
+    if isinstance(data, dict) and "items" in data:
+        return ReceiptData.from_list(data.get("items", []), data.get("total", 0.0))
+    return None
+
+
+# Public API
+
+def save_receipt(receipt: ReceiptData, path: str = STORE_PATH) -> bool:
+    """Atomically write `receipt`; returns False when the file is already up to date."""
+    fingerprint = _fingerprint(receipt)
+    with _lock:
+        known = _known.get(path)
+        if _fingerprints.get(path) == fingerprint and known and known[1] == _mtime_ns(path):
+            return False  # same object, untouched since our last save: skip encoding too
+
+    digest, content = _encode(receipt)
+    with _lock:
+        # Unchanged content, and nobody replaced the file since we last saw it
+        if _known.get(path) == (digest, _mtime_ns(path)):
+            _fingerprints[path] = fingerprint
+            return False
+
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".receipt-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        _known[path] = (digest, _mtime_ns(path))
+        _fingerprints[path] = fingerprint
+    return True
+
+
+def load_receipt(path: str = STORE_PATH, legacy_path: str = LEGACY_PICKLE_PATH) -> Optional[ReceiptData]:
+    """Load the stored receipt (or the legacy pickle); None when nothing is saved."""
+    if os.path.exists(path):
+        mtime = _mtime_ns(path)
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            columns = json.loads(f.readline())
+        receipt = _decode(header, columns)
+        with _lock:
+            _known[path] = (header.get("digest"), mtime)
+        return receipt
+
+    if legacy_path and os.path.exists(legacy_path):
+        with open(legacy_path, "rb") as f:
+            receipt = _from_legacy(pickle.load(f))
+        if receipt is not None:
+            save_receipt(receipt, path)
+            print(f"Migrated {legacy_path} → {path}")
+        return receipt
+
+    return None
@@ -43,11 +43,12 @@ class SessionDataManager:
 # Session Variables (Global App State)
 
 # Model & App Settings
-model_name = SessionDataManager("model_name", ModelNames.GEMINI)
+model_name = SessionDataManager("model_name", ModelNames.AUTO)
 currency = SessionDataManager("currency", "IDR")
 
 # Receipt Upload
 uploaded_receipt = SessionDataManager("uploaded_receipt")
+draft_receipt = SessionDataManager("draft_receipt")  # {"key", "receipt", "version"} of the upload being edited
 receipt_image = SessionDataManager("receipt_image")
 
 # Splitting & Participants
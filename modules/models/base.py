@@ -1,6 +1,12 @@
+import asyncio
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
 from PIL import Image
-from modules.data.receipt_data import ReceiptData
+from modules.data.receipt_data import ItemData, ReceiptData
+
+
+DEFAULT_CONCURRENCY = 4
 
 
 class AIModel(ABC):
@@ -13,4 +19,60 @@ class AIModel(ABC):
 
     def fallback(self, image: Image.Image) -> ReceiptData:
         """Fallback method if model fails."""
-        raise NotImplementedError("No fallback model implemented.")
\ No newline at end of file
+        raise NotImplementedError("No fallback model implemented.")
+
+    def run_batch(self, images: List[Image.Image]) -> List[ReceiptData]:
+        """Extract several images in one pass (override for true batching)."""
+        return [self.run(image) for image in images]
+
+    def run_streaming(self, image: Image.Image, on_item: Callable[[ItemData], None]) -> ReceiptData:
+        """Extract and report items through `on_item` (non-streaming models emit at the end)."""
+        receipt = self.run(image)
+        for item in receipt.items.values():
+            on_item(item)
+        return receipt
+
+    # Async Batch Extraction
+
+    def executor(self) -> Optional[Executor]:
+        """Executor for blocking `run` calls (None = asyncio default pool)."""
+        return None
+
+    async def arun(self, image: Image.Image) -> ReceiptData:
+        """Async single extraction; subclasses may override with native async IO."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(), self.run, image)
+
+    async def extract_many(
+        self,
+        images: Sequence[Image.Image],
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> AsyncIterator[Tuple[int, ReceiptData]]:
+        """Yield (index, receipt) pairs as each extraction completes."""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def _one(idx: int, image: Image.Image) -> Tuple[int, ReceiptData]:
+            async with semaphore:
+                return idx, await self.arun(image)
+
+        tasks = [asyncio.ensure_future(_one(i, img)) for i, img in enumerate(images)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def run_many(
+        self,
+        images: Sequence[Image.Image],
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[ReceiptData]:
+        """Blocking helper for Streamlit: extract all images, keep input order."""
+        async def _collect() -> List[ReceiptData]:
+            results: List[Optional[ReceiptData]] = [None] * len(images)
+            async for idx, receipt in self.extract_many(images, concurrency):
+                results[idx] = receipt
+            return results
+
+        return asyncio.run(_collect())
@@ -0,0 +1,127 @@
+"""
+Dynamic micro-batching for local (offline) inference.
+
+Concurrent Streamlit sessions submit images to one process-level
+`InferenceServer`. A single worker thread groups pending requests into
+micro-batches (bounded by `max_batch_size` and `max_wait_ms`), runs each
+batch through `model.run_batch` in one pass and resolves the callers'
+futures. This keeps local models from fighting each other for the CPU.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+from PIL import Image
+
+from modules.data.receipt_data import ReceiptData
+from modules.models.base import AIModel
+
+
+MAX_BATCH_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "25"))
+
+
+# Inference Server
+
+class InferenceServer:
+    """Collect requests from many threads into micro-batches for one model."""
+
+    def __init__(self, model: AIModel, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._queue: "queue.Queue[Tuple[Image.Image, Future]]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, image: Image.Image) -> Future:
+        """Queue one image; returns a Future resolving to ReceiptData."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "pending": self._queue.qsize(),
+        }
+
+    # Worker
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                name = f"inference-{getattr(self.model, 'model_name', 'model')}"
+                self._worker = threading.Thread(target=self._loop, name=name, daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> List[Tuple[Image.Image, Future]]:
+        """Block for the first request, then gather more until size/time limit."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            # Drop requests whose caller already cancelled
+            batch = [(img, fut) for img, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                results = self.model.run_batch([img for img, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), receipt in zip(batch, results):
+                fut.set_result(receipt)
+            # A short result list must not leave callers waiting forever
+            if len(results) != len(batch):
+                error = RuntimeError(f"run_batch returned {len(results)} results for {len(batch)} images")
+                for _, fut in batch[len(results):]:
+                    fut.set_exception(error)
+
+
+# Model Wrapper
+
+class BatchedModel(AIModel):
+    """AIModel facade that routes every call through an InferenceServer."""
+
+    def __init__(self, model: AIModel, **server_kwargs):
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+        self.server = InferenceServer(model, **server_kwargs)
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        return self.server.submit(image).result()
+
+    async def arun(self, image: Image.Image) -> ReceiptData:
+        return await asyncio.wrap_future(self.server.submit(image))
+
+    def run_batch(self, images: List[Image.Image]) -> List[ReceiptData]:
+        futures = [self.server.submit(img) for img in images]
+        return [f.result() for f in futures]
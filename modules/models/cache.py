@@ -0,0 +1,207 @@
+"""
+Content-addressed cache for receipt extraction results.
+
+Every model (Gemini, Donut, comparator) shares one process-wide
+`extraction_cache`, so a Streamlit rerun on the same image never
+pays for the same extraction twice.
+
+Key   : sha256(image pixels + model id + prompt version)
+Layer : in-memory LRU  →  on-disk JSON files (size bounded)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from PIL import Image
+
+from modules.data.receipt_data import ReceiptData
+
+
+CACHE_DIR = os.path.join("data", "cache", "extraction")
+
+
+# Key Helpers
+
+def image_digest(image: Image.Image) -> str:
+    """Hash the decoded pixel data (independent of file name or container)."""
+    h = hashlib.sha256()
+    h.update(f"{image.mode}|{image.size[0]}x{image.size[1]}|".encode("utf-8"))
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def make_key(image: Image.Image, model_id: str, version: str) -> str:
+    """Build cache key from image hash + model id + prompt version."""
+    raw = f"{image_digest(image)}|{model_id}|{version}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Serialization
+
+def _to_payload(receipt: ReceiptData) -> dict:
+    return {
+        "items": [
+            {"name": it.name, "price": it.price, "category": it.category}
+            for it in receipt.items.values()
+        ],
+        "total": receipt.total,
+        "meta": dict(receipt.meta or {}),
+    }
+
+
+def _from_payload(payload: dict) -> ReceiptData:
+    receipt = ReceiptData.from_list(payload.get("items", []), payload.get("total", 0.0))
+    receipt.meta = dict(payload.get("meta", {}))
+    return receipt
+
+
+# Extraction Cache
+
+class ExtractionCache:
+    """Two-level (memory + disk) LRU cache with hit/miss counters."""
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        max_memory_entries: int = 128,
+        max_disk_entries: int = 2000,
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Lookup
+
+    def get(self, key: str) -> Optional[ReceiptData]:
+        """Return a fresh ReceiptData for key, or None on miss."""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return _from_payload(payload)
+
+        payload = self._read_disk(key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, payload)
+        return _from_payload(payload)
+
+    def put(self, key: str, receipt: ReceiptData) -> None:
+        """Store extraction result in memory and on disk."""
+        payload = _to_payload(receipt)
+        with self._lock:
+            self._remember(key, payload)
+        self._write_disk(key, payload)
+
+    def get_or_compute(
+        self,
+        image: Image.Image,
+        model_id: str,
+        version: str,
+        compute: Callable[[Image.Image], ReceiptData],
+    ) -> ReceiptData:
+        """Return cached result, or run `compute(image)` and cache it."""
+        key = make_key(image, model_id, version)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        receipt = compute(image)
+        self.put(key, receipt)
+        return receipt
+
+    # Maintenance
+
+    def clear(self) -> None:
+        """Drop all entries (memory and disk)."""
+        with self._lock:
+            self._memory.clear()
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+            }
+
+    # Internal Helpers
+
+    def _remember(self, key: str, payload: dict) -> None:
+        """Insert into memory LRU (caller holds the lock)."""
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            os.utime(path)  # refresh LRU position on disk
+            return payload
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, payload: dict) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, self._path(key))
+            self._evict_disk()
+        except OSError as e:
+            print(f"Extraction cache write failed: {e}")
+
+    def _evict_disk(self) -> None:
+        """Remove least recently used files when over the disk bound."""
+        entries = [
+            os.path.join(self.cache_dir, n)
+            for n in os.listdir(self.cache_dir) if n.endswith(".json")
+        ]
+        overflow = len(entries) - self.max_disk_entries
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda p: os.path.getmtime(p))
+        for path in entries[:overflow]:
+            try:
+                os.remove(path)
+                with self._lock:
+                    self.evictions += 1
+            except OSError:
+                pass
+
+
+# Shared Instance
+
+extraction_cache = ExtractionCache()
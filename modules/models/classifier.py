@@ -5,35 +5,202 @@ based on simple keyword patterns.
 Used by:
 - ReceiptData (auto_tag)
 - InsightsEngine (category summary)
+
+Rules are loaded from a JSON (or YAML) file — by default
+`category_rules.json` next to this module, override with
+CATEGORY_RULES_PATH. The file is watched by mtime and a changed file is
+swapped in atomically; in-flight tagging keeps using the rule set it
+started with.
+
+Each rule set is compiled once into a single alternation regex (one
+named group per category, keywords factored as a prefix trie). One pass
+finds the first keyword hit; only categories with a higher priority than
+that hit are re-checked, which keeps "first category with any keyword wins".
 """
 
-def auto_tag(name: str) -> str:
-    """Simple rule-based category classifier for receipt items."""
-    n = name.lower().strip()
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CATEGORY = "Others"
+RULES_PATH = os.getenv(
+    "CATEGORY_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_rules.json"),
+)
+CHECK_INTERVAL_S = 1.0  # how often the rules file mtime is checked
+MAX_CACHED_NAMES = 200_000
+
+
+def _trie_regex(keywords: List[str]) -> str:
+    """Factor keywords by shared prefix so the regex engine can branch on one char."""
+    trie: dict = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end of keyword
+
+    def build(node: dict) -> str:
+        ends = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not ends else f"(?:{'|'.join(branches)})"
+        return f"{body}?" if ends else body
+
+    return build(trie)
+
+
+# Rule Set (immutable, precompiled)
+
+class RuleSet:
+    """One version of the category rules with its compiled index and result cache."""
+
+    def __init__(self, rules: List[Tuple[str, List[str]]], default: str = DEFAULT_CATEGORY):
+        cleaned = [(name, [k.lower().strip() for k in kws if k.strip()]) for name, kws in rules]
+        self.rules = [(name, kws) for name, kws in cleaned if kws]
+        self.default = default
+        self.categories = [name for name, _ in self.rules]
+        self.version = hashlib.sha1(
+            json.dumps([self.rules, default]).encode("utf-8")
+        ).hexdigest()[:12]
+
+        tries = [_trie_regex(kws) for _, kws in self.rules]
+        self._pattern = (
+            re.compile("|".join(f"(?P<c{i}>{t})" for i, t in enumerate(tries))) if tries else None
+        )
+        self._category_patterns = [re.compile(t) for t in tries]
+        self.cache: Dict[str, str] = {}
+
+    def _match(self, n: str) -> str:
+        match = self._pattern.search(n) if self._pattern else None
+        if match is None:
+            return self.default
 
-    # Food
-    if any(k in n for k in ["nasi", "rice", "burger", "mie", "toast", "cake", "bread", "pizza", "soup", "chicken", "udang", "pangsit", "siomay"]):
-        return "Food"
+        # Leftmost hit may belong to a lower-priority category: confirm the ones above it
+        priority = int(match.lastgroup[1:])
+        for higher in range(priority):
+            if self._category_patterns[higher].search(n):
+                return self.categories[higher]
+        return self.categories[priority]
 
-    # Beverage
-    if any(k in n for k in ["coffee", "latte", "americano", "tea", "milk", "juice", "float", "ice", "korean", "mineral", "mocha"]):
-        return "Beverage"
+    def tag(self, n: str) -> str:
+        """Tag a normalised (lower-cased, stripped) name, memoised per rule set."""
+        tag = self.cache.get(n)
+        if tag is None:
+            if len(self.cache) >= MAX_CACHED_NAMES:
+                self.cache.clear()
+            tag = self.cache[n] = self._match(n)
+        return tag
 
-    # Service / Charge
-    if any(k in n for k in ["tax", "service", "fee", "charge"]):
-        return "Service"
+    def inherit_cache(self, old: "RuleSet") -> int:
+        """
+        Keep cached results the rule change cannot affect.
 
-    # Fashion
-    if any(k in n for k in ["shirt", "pants", "bag", "shoe", "jacket", "hat", "dress"]):
-        return "Fashion"
+        A result of the category at priority p only depends on categories
+        0..p, so it is kept when every category up to p is unchanged.
+        """
+        first_changed = 0
+        for old_rule, new_rule in zip(old.rules, self.rules):
+            if old_rule != new_rule:
+                break
+            first_changed += 1
+        defaults_valid = (
+            first_changed == len(old.rules) == len(self.rules) and old.default == self.default
+        )
 
-    # Toiletries
-    if any(k in n for k in ["soap", "shampo", "toothpaste", "tissue", "micellar", "cleanser", "toner", "serum", "perfume"]):
-        return "Toiletries"
+        priority = {name: i for i, name in enumerate(old.categories)}
+        for n, tag in list(old.cache.items()):
+            p = priority.get(tag)
+            if (p is not None and p < first_changed) or (p is None and defaults_valid):
+                self.cache[n] = tag
+        return len(self.cache)
+
+
+# Rule Loading
+
+def load_rules(path: str) -> RuleSet:
+    """Read a rules file (JSON, or YAML when PyYAML is installed)."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    rules = [(c["name"], list(c.get("keywords", []))) for c in data.get("categories", [])]
+    return RuleSet(rules, data.get("default", DEFAULT_CATEGORY))
+
+
+class RuleIndex:
+    """Holds the active RuleSet and hot-reloads it when the file's mtime changes."""
+
+    def __init__(self, path: str = RULES_PATH, check_interval_s: float = CHECK_INTERVAL_S):
+        self.path = path
+        self.check_interval_s = check_interval_s
+        self._rules: RuleSet = RuleSet([])
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    def current(self) -> RuleSet:
+        """Return the active rule set, reloading first if the file changed."""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval_s
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+        return self._rules
+
+    def reload(self) -> bool:
+        """Load and swap in the rules file; keep the old rules if it is invalid."""
+        # Another thread is already reloading: keep tagging with the current rules
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            # mtime from before the load: a write during loading is picked up on the next check
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            try:
+                new_rules = load_rules(self.path)
+            except Exception as e:
+                print(f"Category rules not reloaded ({self.path}): {e}")
+                return False
+            finally:
+                # Do not retry a broken file until it changes again
+                self._mtime = mtime
+            kept = new_rules.inherit_cache(self._rules)
+            self._rules = new_rules  # atomic reference swap
+            print(
+                f"Category rules {new_rules.version} loaded "
+                f"({len(new_rules.categories)} categories, {kept} cached names kept)"
+            )
+            return True
+        finally:
+            self._reload_lock.release()
+
+
+rule_index = RuleIndex()
+
+
+# Public API
+
+def auto_tag(name: str) -> str:
+    """Simple rule-based category classifier for receipt items."""
+    return rule_index.current().tag(name.lower().strip())
 
-    # Stationery
-    if any(k in n for k in ["pen", "book", "notebook", "pencil", "marker", "eraser"]):
-        return "Stationery"
 
-    # Default
-    return "Others"
+def auto_tag_batch(names: Iterable[str]) -> List[str]:
+    """Tag many names against one rule-set snapshot; repeated names are matched once."""
+    rules = rule_index.current()
+    return [rules.tag(name.lower().strip()) for name in names]
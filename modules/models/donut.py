@@ -1,30 +1,197 @@
-from PIL import Image
-import pytesseract
+"""
+Offline Donut (VisionEncoderDecoder) receipt parser.
+
+The checkpoint is loaded lazily from a local directory once per process,
+quantized to dynamic int8 and run under `torch.inference_mode()`. The
+model registry wraps it in a `BatchedModel`, whose single InferenceServer
+worker runs one batched forward pass at a time, so concurrent requests
+never run Donut in parallel and torch's own intra-op threads are the
+only CPU parallelism. A failed load (e.g. missing checkpoint) is
+remembered, so later calls fail fast instead of retrying the load.
+
+Config (environment):
+- DONUT_CHECKPOINT_DIR : local checkpoint (default: models/donut-cord-v2)
+- DONUT_TASK_PROMPT    : decoder start prompt (default: <s_cord-v2>)
+- DONUT_NUM_THREADS    : torch intra-op threads (default: unset, torch decides).
+                         torch.set_num_threads is process-wide, so it is only
+                         applied when set explicitly and then affects every
+                         torch user in the process.
+"""
+
+import os
 import re
-from modules.data.receipt_data import ReceiptData, ItemData
+import threading
+from typing import List, Optional
+
+from PIL import Image
 
+from modules.data.receipt_data import ReceiptData
+from modules.models.base import AIModel
+from modules.models.cache import extraction_cache, make_key
 
-class DonutModel:
-    """Simple OCR-based fallback model (works offline)."""
 
-    def __init__(self):
-        print("Using Donut Fallback Model (OCR only)")
+CHECKPOINT_DIR = os.getenv("DONUT_CHECKPOINT_DIR", os.path.join("models", "donut-cord-v2"))
+TASK_PROMPT = os.getenv("DONUT_TASK_PROMPT", "<s_cord-v2>")
+NUM_THREADS = int(os.getenv("DONUT_NUM_THREADS", "0"))  # 0 = leave torch's global setting alone
+MAX_LENGTH = 768
+PARSER_VERSION = "v1"
 
-    def run(self, image: Image.Image) -> ReceiptData:
-        text = pytesseract.image_to_string(image)
-        lines = [line.strip() for line in text.split("\n") if line.strip()]
-        items = {}
-
-        # Extract format: name + price (last number)
-        for i, line in enumerate(lines):
-            match = re.findall(r"(.*?)(\d+[,.]?\d*)$", line)
-            if match:
-                name, price = match[0]
+
+# Lazy Backend (once per process)
+
+class _DonutBackend:
+    """Loaded processor + quantized model."""
+
+    def __init__(self, checkpoint_dir: str):
+        import torch
+        from transformers import DonutProcessor, VisionEncoderDecoderModel
+
+        if not os.path.isdir(checkpoint_dir):
+            raise FileNotFoundError(f"Donut checkpoint not found: {checkpoint_dir}")
+
+        if NUM_THREADS:
+            torch.set_num_threads(NUM_THREADS)  # process-wide: opt-in only
+        print(f"Loading Donut checkpoint from {checkpoint_dir} ({torch.get_num_threads()} threads)...")
+
+        self.torch = torch
+        self.processor = DonutProcessor.from_pretrained(checkpoint_dir, local_files_only=True)
+        model = VisionEncoderDecoderModel.from_pretrained(checkpoint_dir, local_files_only=True)
+        model.eval()
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        tokenizer = self.processor.tokenizer
+        self.task_ids = tokenizer(TASK_PROMPT, add_special_tokens=False, return_tensors="pt").input_ids
+        self.max_length = min(MAX_LENGTH, self.model.decoder.config.max_position_embeddings)
+
+    def generate(self, images: List[Image.Image]) -> List[dict]:
+        """Run one batched forward pass and return parsed JSON per image."""
+        tokenizer = self.processor.tokenizer
+        pixel_values = self.processor(
+            [im.convert("RGB") for im in images], return_tensors="pt"
+        ).pixel_values
+        decoder_input_ids = self.task_ids.repeat(len(images), 1)
+
+        with self.torch.inference_mode():
+            outputs = self.model.generate(
+                pixel_values,
+                decoder_input_ids=decoder_input_ids,
+                max_length=self.max_length,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id,
+                bad_words_ids=[[tokenizer.unk_token_id]],
+                num_beams=1,
+                use_cache=True,
+            )
+
+        results = []
+        for seq in self.processor.batch_decode(outputs):
+            seq = seq.replace(tokenizer.eos_token, "").replace(tokenizer.pad_token, "")
+            seq = re.sub(r"<.*?>", "", seq, count=1).strip()  # drop task start token
+            results.append(self.processor.token2json(seq))
+        return results
+
+
+_backend: Optional[_DonutBackend] = None
+_backend_error: Optional[Exception] = None
+_backend_lock = threading.Lock()
+
+
+def load_backend(checkpoint_dir: str = CHECKPOINT_DIR) -> _DonutBackend:
+    """Load the Donut backend once per process (thread-safe); a failed load is cached."""
+    global _backend, _backend_error
+    if _backend is None:
+        with _backend_lock:
+            if _backend_error is not None:
+                raise RuntimeError(f"Donut backend unavailable: {_backend_error}") from _backend_error
+            if _backend is None:
                 try:
-                    price_val = float(price.replace(",", "").replace(".", ""))
-                    items[f"item_{i}"] = ItemData(name.strip(), price_val)
-                except ValueError:
-                    continue
+                    _backend = _DonutBackend(checkpoint_dir)
+                except Exception as e:
+                    _backend_error = e
+                    raise
+    return _backend
+
+
+# Output Parsing
+
+def parse_price(text) -> float:
+    """Parse receipt price strings like '25,000', '12.50' or 'Rp 9.000'."""
+    s = re.sub(r"[^\d.,]", "", str(text))
+    if not s:
+        return 0.0
+    # Trailing 1-2 digits after the last separator = decimal part
+    match = re.match(r"^(.*?)[.,](\d{1,2})$", s)
+    if match:
+        whole = re.sub(r"[.,]", "", match.group(1)) or "0"
+        return float(f"{whole}.{match.group(2)}")
+    return float(re.sub(r"[.,]", "", s))
+
+
+def cord_to_receipt(data: dict) -> ReceiptData:
+    """Convert CORD-style Donut output into ReceiptData."""
+    menus = data.get("menu", [])
+    if isinstance(menus, dict):
+        menus = [menus]
+
+    rows = []
+    for m in menus:
+        if not isinstance(m, dict) or not m.get("nm") or "price" not in m:
+            continue
+        rows.append({"name": str(m["nm"]), "price": parse_price(m["price"])})
+
+    total_block = data.get("total", {})
+    total = parse_price(total_block.get("total_price", "")) if isinstance(total_block, dict) else 0.0
+    if not total:
+        total = sum(r["price"] for r in rows)
+
+    receipt = ReceiptData.from_list(rows, total)
+    receipt.meta["detected_total"] = total
+    return receipt
+
+
+# Donut Model
+
+class DonutModel(AIModel):
+    """Offline Donut transformer model (falls back to Tesseract OCR)."""
+
+    def __init__(self, checkpoint_dir: str = CHECKPOINT_DIR):
+        self.model_name = "Donut"
+        self.checkpoint_dir = checkpoint_dir
+        self.cache_id = f"donut:{os.path.basename(os.path.normpath(checkpoint_dir))}"
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        try:
+            return extraction_cache.get_or_compute(image, self.cache_id, PARSER_VERSION, self._extract)
+        except Exception as e:
+            print(f"Donut failed: {e}")
+            return self.fallback(image)
+
+    def run_batch(self, images: List[Image.Image]) -> List[ReceiptData]:
+        """Answer cache hits directly and decode all misses in one batched pass."""
+        keys = [make_key(img, self.cache_id, PARSER_VERSION) for img in images]
+        results: List[Optional[ReceiptData]] = [extraction_cache.get(k) for k in keys]
+        misses = [i for i, r in enumerate(results) if r is None]
+        if not misses:
+            return results
+
+        try:
+            backend = load_backend(self.checkpoint_dir)
+            outputs = backend.generate([images[i] for i in misses])
+            for i, data in zip(misses, outputs):
+                results[i] = cord_to_receipt(data)
+                extraction_cache.put(keys[i], results[i])
+        except Exception as e:
+            print(f"Donut batch failed: {e}")
+            for i in misses:
+                results[i] = self.fallback(images[i])
+        return results
+
+    def fallback(self, image: Image.Image) -> ReceiptData:
+        """Use Tesseract OCR when no checkpoint is available."""
+        print("Fallback to Tesseract OCR model...")
+        from modules.models.loader import ModelNames, get_model_instance
+        return get_model_instance(ModelNames.OCR).run(image)
 
-        total = sum(it.price for it in items.values())
-        return ReceiptData(items=items, total=total)
\ No newline at end of file
+    def _extract(self, image: Image.Image) -> ReceiptData:
+        backend = load_backend(self.checkpoint_dir)
+        return cord_to_receipt(backend.generate([image])[0])
@@ -1,7 +1,8 @@
+import asyncio
 import base64
 import json
 import os
-from io import BytesIO
+from typing import Callable
 from PIL import Image
 
 from langchain_core.messages import HumanMessage
@@ -10,9 +11,26 @@ from modules.data.receipt_data import ReceiptData, ItemData
 from modules.utils import AIError, SettingsError
 from modules.models.classifier import auto_tag
 from modules.models.base import AIModel
+from modules.models.cache import extraction_cache, make_key
+from modules.models.resilience import (
+    CircuitBreaker, CircuitOpenError, call_with_deadline, hedged_call, iterate_with_deadline,
+)
+from modules.pipeline.preprocess import PreprocessConfig, preprocess_image
+from modules.pipeline.stream_parser import IncrementalMenuParser
 
 
 MODEL_NAME = "gemini-2.5-flash"
+PROMPT_VERSION = "v1"  # bump when PROMPT changes (invalidates cached extractions)
+
+# Resilience settings (environment)
+TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "20"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "1"))
+HEDGE_DELAY_S = float(os.getenv("GEMINI_HEDGE_DELAY_S", "0"))  # 0 = hedging off
+BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_S = float(os.getenv("GEMINI_BREAKER_COOLDOWN_S", "60"))
+
+# One breaker per process: an outage seen by one session protects all others
+breaker = CircuitBreaker("gemini", failure_threshold=BREAKER_FAILURES, cooldown_s=BREAKER_COOLDOWN_S)
 
 PROMPT = """
 You are an AI specialized in reading receipts.
@@ -29,47 +47,247 @@ Rules:
 """
 
 
+def _chunk_text(content) -> str:
+    """Streamed chunk content may be a string or a list of content blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else str(part.get("text", ""))
+            for part in content
+        )
+    return ""
+
+
 class GeminiModel(AIModel):
     """Simplified Gemini model with safe JSON parsing and fallback."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        preprocess: PreprocessConfig = PreprocessConfig(),
+        timeout_s: float = TIMEOUT_S,
+        hedge_delay_s: float = HEDGE_DELAY_S,
+    ) -> None:
         key = os.getenv("GOOGLE_API_KEY", "").strip()
         if not key:
             raise SettingsError("Missing GOOGLE_API_KEY")
         print("Initializing Gemini AI Model...")
-        self.llm = ChatGoogleGenerativeAI(model=MODEL_NAME, temperature=0.0)
+        self.llm = ChatGoogleGenerativeAI(
+            model=MODEL_NAME, temperature=0.0, timeout=timeout_s, max_retries=MAX_RETRIES
+        )
         self.model_name = "Gemini"
+        self.timeout_s = timeout_s
+        self.hedge_delay_s = hedge_delay_s
+        self.preprocess = preprocess
+        # Preprocessing changes what Gemini sees, so it is part of the cache key
+        self.cache_version = f"{PROMPT_VERSION}:{preprocess.signature()}"
 
-    def _encode_image(self, image: Image.Image) -> str:
-        buf = BytesIO()
-        image.save(buf, format="PNG")
-        return base64.b64encode(buf.getvalue()).decode("utf-8")
+    def _encode_image(self, image: Image.Image) -> tuple:
+        """Preprocess + encode image; returns (base64 data, mime type)."""
+        result = preprocess_image(image, self.preprocess)
+        saved = "" if result.bytes_saved is None else f", {result.bytes_saved / 1024:.0f} KB saved vs PNG"
+        print(
+            f"Gemini payload: {result.encoded_bytes / 1024:.0f} KB "
+            f"({result.raw_ratio:.1%} of raw pixels, {result.size[0]}x{result.size[1]}{saved})"
+        )
+        return base64.b64encode(result.data).decode("utf-8"), result.mime_type
 
     def run(self, image: Image.Image) -> ReceiptData:
         try:
-            msg = HumanMessage(content=[
-                {"type": "text", "text": PROMPT},
-                {"type": "image_url", "image_url": f"data:image/png;base64,{self._encode_image(image)}"}
-            ])
-            response = self.llm.invoke([msg]).content
-            if not isinstance(response, str):
-                raise AIError("Gemini returned non-text response")
-
-            clean = response.replace("```json", "").replace("```", "").strip()
-            data = json.loads(clean)
-
-            menus = data.get("menus", [])
-            total = float(data.get("total", 0))
-
-            items = {
-                f"item_{i}": ItemData(m["name"], float(m["price"]))
-                for i, m in enumerate(menus) if "name" in m and "price" in m
-            }
-            print("Gemini parsing successful.")
-            return ReceiptData(items=items, total=total)
+            if self.hedge_delay_s > 0:
+                return self.run_hedged(image)
+            return self.run_remote(image)
+        except Exception as e:
+            print(f"Gemini failed: {e}")
+            return self.fallback(image)
+
+    def run_remote(self, image: Image.Image, deadline: bool = True) -> ReceiptData:
+        """
+        Cached Gemini call guarded by the circuit breaker (raises on failure).
+        `deadline=False` skips the extra deadline thread when the caller
+        already bounds the call (hedging); the client timeout still applies.
+        """
+        key = make_key(image, MODEL_NAME, self.cache_version)
+        cached = extraction_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if not breaker.allow():
+            raise CircuitOpenError("Gemini circuit open — skipping remote call")
+        try:
+            if deadline:
+                response = call_with_deadline(lambda: self._invoke(image), self.timeout_s)
+            else:
+                response = self._invoke(image)
+        except Exception:
+            breaker.record_failure()  # also releases a half-open trial
+            raise
+        except BaseException:
+            breaker.release()  # interrupted, not failed
+            raise
+        breaker.record_success()
+
+        # Bad JSON is not an availability problem: parse outside the breaker
+        receipt = self._parse_response(response)
+        extraction_cache.put(key, receipt)
+        return receipt
+
+    def run_hedged(self, image: Image.Image) -> ReceiptData:
+        """Race local OCR against Gemini once `hedge_delay_s` has passed."""
+        from modules.models.loader import ModelNames, get_model_instance
+        local = get_model_instance(ModelNames.OCR)
+        return hedged_call(
+            primary=lambda: self.run_remote(image, deadline=False),
+            backup=lambda: local.run(image),
+            hedge_delay_s=self.hedge_delay_s,
+            timeout_s=self.timeout_s,
+            is_valid=lambda receipt: bool(receipt.items),
+        )
+
+    def run_streaming(
+        self,
+        image: Image.Image,
+        on_item: Callable[[ItemData], None],
+        fallback: bool = True,
+    ) -> ReceiptData:
+        """
+        Stream the Gemini answer and emit each item as soon as it is complete.
+        With hedging configured, the hedged (non-streaming) `run` is used
+        instead and its items are emitted once it returns.
+        """
+        key = make_key(image, MODEL_NAME, self.cache_version)
+        cached = extraction_cache.get(key)
+        if cached is not None:
+            for item in cached.items.values():
+                on_item(item)
+            return cached
+
+        if self.hedge_delay_s > 0:
+            receipt = self.run(image) if fallback else self.run_hedged(image)
+            for item in receipt.items.values():
+                on_item(item)
+            return receipt
+
+        # Errors raised by the caller's on_item (incl. Streamlit rerun / stop,
+        # which are BaseException) are not Gemini failures
+        callback_errors = []
+
+        def emit(item: ItemData) -> None:
+            try:
+                on_item(item)
+            except BaseException as e:
+                callback_errors.append(e)
+                raise
+
+        try:
+            if not breaker.allow():
+                raise CircuitOpenError("Gemini circuit open — skipping remote call")
+            try:
+                receipt = self._extract_streaming(image, emit)
+            except BaseException as e:
+                if isinstance(e, Exception) and not callback_errors:
+                    breaker.record_failure()  # also releases a half-open trial
+                else:
+                    breaker.release()
+                raise
+            breaker.record_success()
+            extraction_cache.put(key, receipt)
+            return receipt
+        except Exception as e:
+            if not fallback or callback_errors:
+                raise
+            print(f"Gemini streaming failed: {e}")
+            receipt = self.fallback(image)
+            for item in receipt.items.values():
+                on_item(item)
+            return receipt
+
+    def _extract_streaming(self, image: Image.Image, on_item: Callable[[ItemData], None]) -> ReceiptData:
+        parser = IncrementalMenuParser()
+        items = {}
+        stream = self.llm.stream([self._build_message(image)])
+
+        # Deadline covers the whole stream, including a stall between chunks
+        for chunk in iterate_with_deadline(stream, self.timeout_s):
+            for m in parser.feed(_chunk_text(chunk.content)):
+                if "name" in m and "price" in m:
+                    item = ItemData(m["name"], float(m["price"]))
+                    items[f"item_{len(items)}"] = item
+                    on_item(item)
+
+        data = parser.result()
+        if not items and not data:
+            raise AIError("Gemini returned no parsable items")
+        print("Gemini streaming parse successful.")
+        # Re-tag the whole receipt in one batch once streaming is done
+        rows = [{"name": it.name, "price": it.price} for it in items.values()]
+        return ReceiptData.from_list(rows, float(data.get("total", 0) or 0))
+
+    def fallback(self, image: Image.Image) -> ReceiptData:
+        """Use the offline Donut model when Gemini is unavailable."""
+        print("Fallback to offline Donut model...")
+        from modules.models.loader import ModelNames, get_model_instance
+        return get_model_instance(ModelNames.DONUT).run(image)
+
+    async def arun(self, image: Image.Image) -> ReceiptData:
+        """Native async extraction via `ainvoke` (used by extract_many)."""
+        try:
+            key = await asyncio.to_thread(make_key, image, MODEL_NAME, self.cache_version)
+            cached = extraction_cache.get(key)
+            if cached is not None:
+                return cached
 
+            if not breaker.allow():
+                raise CircuitOpenError("Gemini circuit open — skipping remote call")
+            try:
+                msg = await asyncio.to_thread(self._build_message, image)
+                response = await asyncio.wait_for(self.llm.ainvoke([msg]), timeout=self.timeout_s or None)
+            except Exception:
+                breaker.record_failure()  # timeouts from wait_for count; also releases a half-open trial
+                raise
+            except BaseException:
+                # Cancellation (extract_many) releases a half-open trial without counting as a failure
+                breaker.release()
+                raise
+            breaker.record_success()
+
+            receipt = self._parse_response(response.content)
+            extraction_cache.put(key, receipt)
+            return receipt
         except Exception as e:
             print(f"Gemini failed: {e}")
-            print("Fallback to Donut OCR model...")
-            from modules.models.donut import DonutModel
-            return DonutModel().run(image)
\ No newline at end of file
+            print("Fallback to offline Donut model...")
+            from modules.models.loader import ModelNames, get_model_instance
+            return await get_model_instance(ModelNames.DONUT).arun(image)
+
+    def _invoke(self, image: Image.Image):
+        """Call Gemini and return the raw answer content (raises on failure)."""
+        return self.llm.invoke([self._build_message(image)]).content
+
+    def _extract(self, image: Image.Image) -> ReceiptData:
+        """Call Gemini and parse its JSON answer (raises on failure)."""
+        return self._parse_response(self._invoke(image))
+
+    def _build_message(self, image: Image.Image) -> HumanMessage:
+        data, mime_type = self._encode_image(image)
+        return HumanMessage(content=[
+            {"type": "text", "text": PROMPT},
+            {"type": "image_url", "image_url": f"data:{mime_type};base64,{data}"}
+        ])
+
+    def _parse_response(self, response) -> ReceiptData:
+        if not isinstance(response, str):
+            raise AIError("Gemini returned non-text response")
+
+        clean = response.replace("```json", "").replace("```", "").strip()
+        data = json.loads(clean)
+
+        menus = data.get("menus", [])
+        total = float(data.get("total", 0))
+
+        rows = [
+            {"name": m["name"], "price": float(m["price"])}
+            for m in menus if "name" in m and "price" in m
+        ]
+        print("Gemini parsing successful.")
+        return ReceiptData.from_list(rows, total)
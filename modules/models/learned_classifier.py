@@ -0,0 +1,303 @@
+"""
+Optional learned item classifier (CPU / NumPy only).
+
+- Features : hashed character n-grams (2–4) computed for a whole batch of
+             names with vectorised NumPy ops
+- Model    : multinomial logistic regression (softmax), trained by
+             full-batch gradient descent
+- Data     : category corrections made in the upload page's data editor,
+             plus the rule keywords as weak examples so every category
+             is known from the start
+
+`predict_categories(names)` classifies a whole receipt or history in one
+call and falls back to the keyword rules when confidence is low.
+"""
+
+import json
+import os
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from modules.models.classifier import auto_tag_batch, rule_index
+
+
+MODEL_DIR = os.path.join("data", "classifier")
+MODEL_PATH = os.path.join(MODEL_DIR, "model.npz")
+CORRECTIONS_PATH = os.path.join(MODEL_DIR, "corrections.jsonl")
+
+N_FEATURES = 2 ** 15
+NGRAM_RANGE = (2, 4)
+CONFIDENCE_THRESHOLD = float(os.getenv("CLASSIFIER_CONFIDENCE", "0.6"))
+CORRECTION_WEIGHT = 3.0  # user corrections count more than rule keywords
+RETRAIN_EVERY = int(os.getenv("CLASSIFIER_RETRAIN_EVERY", "5"))  # corrections between retrains
+
+
+# Featuriser
+
+class HashedNgramFeaturizer:
+    """Map names to sparse hashed char n-gram features, fully vectorised."""
+
+    def __init__(self, n_features: int = N_FEATURES, ngram_range: Tuple[int, int] = NGRAM_RANGE):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+
+    def transform(self, names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return sparse COO triplets (rows, cols, values) for `names`, ordered by row.
+        Each row is L2-normalised.
+        """
+        # One byte buffer for the whole batch, names separated by 0x00
+        joined = b"\x00".join(f" {n.lower().strip()} ".encode("utf-8") for n in names)
+        n_min, n_max = self.ngram_range
+        buf = np.frombuffer(joined + b"\x00" * n_max, dtype=np.uint8).astype(np.uint64)
+        size = len(joined)
+
+        # zeros_before[i] = separators in buf[:i] → also the row of position i
+        zeros_before = np.concatenate(([0], np.cumsum(buf == 0)))
+        positions = np.arange(size)
+
+        # FNV-style hash extended one byte per n: h_n is built from h_(n-1)
+        prime = np.uint64(1099511628211)
+        h = np.full(size, 1469598103934665603, dtype=np.uint64)
+        hashes, valid = [], []
+        for n in range(1, n_max + 1):
+            h = (h ^ buf[n - 1:n - 1 + size]) * prime
+            if n >= n_min:
+                hashes.append(h % np.uint64(self.n_features))
+                # Window must not contain a separator (cross-name n-gram)
+                valid.append(zeros_before[positions + n] == zeros_before[positions])
+
+        # (positions, n) layout keeps the output sorted by row
+        hashes = np.stack(hashes, axis=1)
+        valid = np.stack(valid, axis=1)
+        rows = np.broadcast_to(zeros_before[:size, None], valid.shape)[valid]
+        cols = hashes[valid].astype(np.int64)
+
+        counts = np.bincount(rows, minlength=len(names)).astype(np.float32)
+        values = 1.0 / np.sqrt(counts[rows])
+        return rows, cols, values
+
+
+# Linear Model
+
+class LinearCategoryModel:
+    """Softmax regression over hashed n-gram features."""
+
+    def __init__(self, classes: List[str], weights: np.ndarray, bias: np.ndarray,
+                 featurizer: Optional[HashedNgramFeaturizer] = None):
+        self.classes = list(classes)
+        self.weights = weights  # (n_features, n_classes)
+        self.bias = bias        # (n_classes,)
+        self.featurizer = featurizer or HashedNgramFeaturizer(weights.shape[0])
+
+    def _scores(self, rows, cols, values, n_rows: int) -> np.ndarray:
+        """Sparse X @ W + b; rows are sorted, so one reduceat sums every row."""
+        scores = np.tile(self.bias, (n_rows, 1))
+        if rows.size == 0:
+            return scores
+        contrib = self.weights[cols] * values[:, None]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        scores[rows[starts]] += np.add.reduceat(contrib, starts, axis=0)
+        return scores
+
+    def predict_proba(self, names: Sequence[str]) -> np.ndarray:
+        rows, cols, values = self.featurizer.transform(names)
+        scores = self._scores(rows, cols, values, len(names))
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def predict(self, names: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """Return (labels, confidence) for every name."""
+        if not names:
+            return [], np.zeros(0)
+        probs = self.predict_proba(names)
+        best = probs.argmax(axis=1)
+        return [self.classes[i] for i in best], probs[np.arange(len(names)), best]
+
+    @classmethod
+    def train(cls, names: Sequence[str], labels: Sequence[str], sample_weight: Optional[Sequence[float]] = None,
+              epochs: int = 300, lr: float = 0.5, l2: float = 1e-4) -> "LinearCategoryModel":
+        featurizer = HashedNgramFeaturizer()
+        classes = sorted(set(labels))
+        y = np.array([classes.index(label) for label in labels])
+        sw = np.ones(len(names)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+        sw = sw / sw.sum()
+
+        rows, cols, values = featurizer.transform(names)
+        model = cls(classes, np.zeros((featurizer.n_features, len(classes))), np.zeros(len(classes)), featurizer)
+        onehot = np.eye(len(classes))[y]
+
+        for _ in range(epochs):
+            scores = model._scores(rows, cols, values, len(names))
+            scores -= scores.max(axis=1, keepdims=True)
+            probs = np.exp(scores)
+            probs /= probs.sum(axis=1, keepdims=True)
+            err = (probs - onehot) * sw[:, None]  # (n_samples, n_classes)
+
+            # Sparse gradient: X^T @ err
+            grad = np.zeros_like(model.weights)
+            for c in range(len(classes)):
+                grad[:, c] = np.bincount(cols, weights=values * err[rows, c], minlength=featurizer.n_features)
+            model.weights -= lr * (grad + l2 * model.weights)
+            model.bias -= lr * err.sum(axis=0)
+        return model
+
+    # Persistence
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, weights=self.weights.astype(np.float32), bias=self.bias,
+                            classes=np.array(self.classes))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "LinearCategoryModel":
+        data = np.load(path, allow_pickle=False)
+        weights = data["weights"]  # float32: halves the gather cost at inference
+        return cls(list(data["classes"]), weights, data["bias"], HashedNgramFeaturizer(weights.shape[0]))
+
+
+# Training Data (user corrections)
+
+_lock = threading.Lock()
+_model: Optional[LinearCategoryModel] = None
+_model_mtime: Optional[float] = None
+
+_train_lock = threading.Lock()
+_train_thread: Optional[threading.Thread] = None
+_train_again = False
+_untrained = 0  # corrections recorded since the last retrain was scheduled
+
+
+def record_corrections(pairs: Iterable[Tuple[str, str]], retrain: bool = True) -> int:
+    """
+    Append (name, category) corrections from the data editor. With
+    `retrain`, a background retrain is scheduled every RETRAIN_EVERY
+    corrections; the caller never waits for training.
+    """
+    global _untrained
+    pairs = [(n.strip(), c.strip()) for n, c in pairs if n and c and n.strip() and c.strip()]
+    if not pairs:
+        return 0
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    with _lock, open(CORRECTIONS_PATH, "a", encoding="utf-8") as f:
+        for name, category in pairs:
+            f.write(json.dumps({"name": name, "category": category}) + "\n")
+
+    with _train_lock:
+        _untrained += len(pairs)
+        due = retrain and _untrained >= RETRAIN_EVERY
+        if due:
+            _untrained = 0
+    if due:
+        schedule_retrain()
+    return len(pairs)
+
+
+def schedule_retrain() -> bool:
+    """
+    Retrain on a background thread. A request made while training is
+    running triggers one more run afterwards (requests are coalesced).
+    Returns False when it was queued behind a running training.
+    """
+    global _train_thread, _train_again
+    with _train_lock:
+        if _train_thread is not None:
+            _train_again = True
+            return False
+        _train_thread = threading.Thread(target=_train_loop, name="classifier-train", daemon=True)
+        _train_thread.start()
+        return True
+
+
+def _train_loop() -> None:
+    global _train_thread, _train_again
+    while True:
+        try:
+            train_from_corrections()
+        except Exception as e:
+            print(f"Learned classifier training failed: {e}")
+        with _train_lock:
+            if not _train_again:
+                _train_thread = None
+                return
+            _train_again = False
+
+
+def load_corrections(path: str = CORRECTIONS_PATH) -> List[Tuple[str, str]]:
+    if not os.path.exists(path):
+        return []
+    latest = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                d = json.loads(line)
+                latest[d["name"].lower()] = (d["name"], d["category"])  # last correction wins
+            except (ValueError, KeyError):
+                continue
+    return list(latest.values())
+
+
+def train_from_corrections() -> Optional[LinearCategoryModel]:
+    """Train on rule keywords + user corrections and persist the model."""
+    global _model, _model_mtime
+    corrections = load_corrections()
+    if not corrections:
+        return None
+
+    names, labels, weights = [], [], []
+    for category, keywords in rule_index.current().rules:
+        for kw in keywords:
+            names.append(kw)
+            labels.append(category)
+            weights.append(1.0)
+    for name, category in corrections:
+        names.append(name)
+        labels.append(category)
+        weights.append(CORRECTION_WEIGHT)
+
+    if len(set(labels)) < 2:
+        return None
+
+    model = LinearCategoryModel.train(names, labels, weights)
+    model.save()
+    with _lock:
+        _model = model
+        _model_mtime = os.path.getmtime(MODEL_PATH)
+    print(f"Learned classifier trained on {len(corrections)} corrections ({len(model.classes)} classes).")
+    return model
+
+
+def get_model() -> Optional[LinearCategoryModel]:
+    """Return the trained model (reloaded when the file changes), or None."""
+    global _model, _model_mtime
+    try:
+        mtime = os.path.getmtime(MODEL_PATH)
+    except OSError:
+        return None
+    if _model is None or mtime != _model_mtime:
+        with _lock:
+            try:
+                _model = LinearCategoryModel.load(MODEL_PATH)
+                _model_mtime = mtime
+            except Exception as e:
+                print(f"Learned classifier unavailable: {e}")
+                return None
+    return _model
+
+
+# Public API
+
+def predict_categories(names: Sequence[str], threshold: float = CONFIDENCE_THRESHOLD) -> List[str]:
+    """Learned prediction for all names in one call; rules where confidence is low."""
+    names = list(names)
+    rules = auto_tag_batch(names)
+    model = get_model()
+    if model is None or not names:
+        return rules
+    labels, confidence = model.predict(names)
+    return [label if conf >= threshold else rule for label, conf, rule in zip(labels, confidence, rules)]
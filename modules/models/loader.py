@@ -1,25 +1,107 @@
+import threading
 from enum import Enum
+from typing import Dict, Iterable, Optional
 from modules.models.base import AIModel
 
 
 class ModelNames(str, Enum):
     GEMINI = "Gemini"
     DONUT = "Donut"
+    OCR = "OCR"
+    AUTO = "Auto"  # local OCR first, escalate to Gemini on low confidence
+
+
+# Warm Model Registry
+
+class ModelRegistry:
+    """
+    Process-wide registry that builds each model once and reuses it
+    (including the Gemini HTTP client) across Streamlit sessions.
+    """
+
+    def __init__(self):
+        self._models: Dict[ModelNames, AIModel] = {}
+        self._lock = threading.RLock()  # re-entrant: composite models build their tiers
+
+    def get(self, model_name: ModelNames) -> AIModel:
+        """Return the shared instance, building it on first use."""
+        model_name = ModelNames(model_name)
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Double-checked: another session may have built it meanwhile
+            model = self._models.get(model_name)
+            if model is None:
+                model = _build_model(model_name)
+                self._models[model_name] = model
+            return model
+
+    def warm(self, model_names: Optional[Iterable[ModelNames]] = None) -> None:
+        """Pre-build models at startup; failures are logged, not raised."""
+        for name in model_names or list(ModelNames):
+            try:
+                self.get(name)
+            except Exception as err:
+                print(f"Warm-up skipped for {name.value}: {err}")
+
+    def invalidate(self, model_name: Optional[ModelNames] = None) -> None:
+        """Drop one (or all) cached instances, e.g. after an API key change."""
+        with self._lock:
+            if model_name is None:
+                self._models.clear()
+            else:
+                self._models.pop(ModelNames(model_name), None)
+
+
+def _build_model(model_name: ModelNames) -> AIModel:
+    if model_name == ModelNames.GEMINI:
+        from modules.models.gemini import GeminiModel
+        return GeminiModel()
+
+    # Local models share one micro-batching inference server per process
+    elif model_name == ModelNames.DONUT:
+        from modules.models.batching import BatchedModel
+        from modules.models.donut import DonutModel
+        return BatchedModel(DonutModel())
+
+    elif model_name == ModelNames.OCR:
+        from modules.models.batching import BatchedModel
+        from modules.models.ocr import OCRModel
+        return BatchedModel(OCRModel())
+
+    elif model_name == ModelNames.AUTO:
+        from modules.models.router import TieredRouterModel
+        return TieredRouterModel(local=model_registry.get(ModelNames.OCR), remote_name=ModelNames.GEMINI.value)
+
+    raise ValueError(f"Unknown model: {model_name}")
+
+
+model_registry = ModelRegistry()
 
 
 def get_model_instance(model_name: ModelNames) -> AIModel:
     """Return a model instance based on selected model name."""
     if model_name == ModelNames.GEMINI:
         try:
-            from modules.models.gemini import GeminiModel
-            return GeminiModel()
+            return model_registry.get(ModelNames.GEMINI)
         except Exception as err:
             print(f"Gemini model failed: {err}. Falling back to Donut...")
-            from modules.models.donut import DonutModel
-            return DonutModel()
+            return model_registry.get(ModelNames.DONUT)
+
+    return model_registry.get(model_name)
+
+
+_warm_lock = threading.Lock()
+_warmed = False
 
-    elif model_name == ModelNames.DONUT:
-        from modules.models.donut import DonutModel
-        return DonutModel()
 
-    raise ValueError(f"Unknown model: {model_name}")
\ No newline at end of file
+def warm_models() -> None:
+    """Warm every registered model once per process (safe to call on each rerun)."""
+    global _warmed
+    with _warm_lock:
+        if _warmed:
+            return
+        _warmed = True
+    model_registry.warm()
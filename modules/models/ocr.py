@@ -0,0 +1,84 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List
+from PIL import Image
+import pytesseract
+import os
+import re
+from modules.data.receipt_data import ReceiptData
+from modules.models.base import AIModel
+from modules.models.cache import extraction_cache
+from modules.pipeline.tiling import needs_tiling, ocr_tiled
+
+
+PARSER_VERSION = "v3"  # bump when the line parser changes
+
+# Tesseract runs as a subprocess, so a thread pool is enough to use every core
+_WORKER_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="ocr")
+
+
+class OCRModel(AIModel):
+    """Simple Tesseract OCR model (works offline, last-resort fallback)."""
+
+    def __init__(self):
+        print("Using Tesseract OCR Model")
+        self.model_name = "OCR"
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        return extraction_cache.get_or_compute(image, "tesseract", PARSER_VERSION, self._extract)
+
+    def run_batch(self, images: List[Image.Image]) -> List[ReceiptData]:
+        # One tesseract process per core; the batch is bounded by the pool size
+        return list(_WORKER_POOL.map(self.run, images))
+
+    def executor(self) -> Executor:
+        return _WORKER_POOL
+
+    def _extract(self, image: Image.Image) -> ReceiptData:
+        if needs_tiling(image):
+            # Tall / multi-page receipts: OCR overlapping strips on all cores
+            return parse_lines(ocr_tiled(image, image_to_lines))
+        return parse_lines(image_to_lines(image))
+
+
+def image_to_lines(image: Image.Image) -> List[str]:
+    """Run tesseract and return non-empty text lines (picklable for process pools)."""
+    text = pytesseract.image_to_string(image)
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+# Line Parser
+
+# Summary lines (totals, payment, change) are not items
+SUMMARY_KEYWORDS = ("total", "jumlah", "subtotal", "sub total", "cash", "tunai", "change", "kembali", "bayar")
+TOTAL_PATTERN = re.compile(r"\b(grand\s*total|total|jumlah)\b", re.IGNORECASE)
+SUBTOTAL_PATTERN = re.compile(r"\bsub\s*total\b", re.IGNORECASE)
+
+
+def parse_lines(lines: List[str]) -> ReceiptData:
+    """Parse OCR lines into items; the printed total goes to meta['detected_total']."""
+    rows = []
+    detected_total = None
+
+    # Extract format: name + price (last number)
+    for line in lines:
+        match = re.findall(r"(.*?)(\d+[,.]?\d*)$", line)
+        if not match:
+            continue
+        name, price = match[0]
+        try:
+            price_val = float(price.replace(",", "").replace(".", ""))
+        except ValueError:
+            continue
+
+        lowered = name.lower()
+        if any(k in lowered for k in SUMMARY_KEYWORDS):
+            if TOTAL_PATTERN.search(lowered) and not SUBTOTAL_PATTERN.search(lowered):
+                detected_total = price_val
+            continue
+        rows.append({"name": name.strip(), "price": price_val})
+
+    subtotal = sum(r["price"] for r in rows)
+    receipt = ReceiptData.from_list(rows, detected_total or subtotal)
+    if detected_total is not None:
+        receipt.meta["detected_total"] = detected_total
+    return receipt
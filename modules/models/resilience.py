@@ -0,0 +1,219 @@
+"""
+Resilience helpers for remote model calls.
+
+- CircuitBreaker : skip a failing backend for a cooldown period
+- call_with_deadline : bound a blocking call by a timeout
+- hedged_call : start a backup call after a delay, return the first valid result
+- iterate_with_deadline : bound a whole (streaming) iterator by a timeout
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+from modules.utils import AIError
+
+
+T = TypeVar("T")
+
+# Separate pools for deadline and hedge calls (threads only wait on network / subprocess IO).
+# A hedged call may itself run a deadline-bound call; with one shared pool, enough
+# concurrent hedges fill every worker with outer tasks waiting on inner ones that
+# can never start.
+# Note: a timed-out call cannot be stopped once running (`Future.cancel()` only
+# drops queued work), so an abandoned request keeps its worker until the client's
+# own timeout ends it; the pools are sized with that in mind.
+_DEADLINE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="deadline")
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class CircuitOpenError(AIError):
+    """Raised when a call is skipped because the breaker is open."""
+    pass
+
+
+# Circuit Breaker
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    closed    : calls pass; consecutive failures are counted
+    open      : calls are skipped until `cooldown_s` has passed
+    half-open : one trial call is allowed; success closes, failure re-opens
+                (`release` ends an interrupted trial without counting it)
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_s:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"Circuit '{self.name}' opened after {self._failures} failures.")
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a call without counting it (interrupted, not failed): frees a half-open trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"state": self._state(), "failures": self._failures}
+
+
+# Deadline & Hedging
+
+def call_with_deadline(fn: Callable[[], T], timeout_s: Optional[float]) -> T:
+    """Run `fn` and raise AIError if it does not finish within `timeout_s`."""
+    if not timeout_s:
+        return fn()
+    future = _DEADLINE_POOL.submit(fn)
+    try:
+        return future.result(timeout=timeout_s)
+    except FutureTimeout:
+        future.cancel()  # only helps if it never started; a running call keeps its worker
+        raise AIError(f"Call exceeded deadline of {timeout_s:.1f}s")
+
+
+def hedged_call(
+    primary: Callable[[], T],
+    backup: Callable[[], T],
+    hedge_delay_s: float,
+    timeout_s: Optional[float] = None,
+    is_valid: Callable[[T], bool] = lambda result: result is not None,
+) -> T:
+    """
+    Start `primary`; if it has not returned a valid result after
+    `hedge_delay_s`, start `backup` too. Return the first valid result.
+    """
+    deadline = time.monotonic() + timeout_s if timeout_s else None
+    pending: Dict[Future, str] = {_HEDGE_POOL.submit(primary): "primary"}
+    backup_started = False
+    last_error: Optional[BaseException] = None
+    fallback_result = None
+
+    while pending:
+        if not backup_started:
+            wait_s = hedge_delay_s
+        else:
+            wait_s = None
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            wait_s = remaining if wait_s is None else min(wait_s, remaining)
+
+        done, _ = wait(list(pending), timeout=wait_s, return_when=FIRST_COMPLETED)
+
+        for fut in done:
+            pending.pop(fut)
+            try:
+                result = fut.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if is_valid(result):
+                for other in pending:
+                    other.cancel()
+                return result
+            fallback_result = result
+
+        if not backup_started and (not done or last_error is not None or fallback_result is not None):
+            # Primary is slow (or already failed): race the backup
+            pending[_HEDGE_POOL.submit(backup)] = "backup"
+            backup_started = True
+            continue
+
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+    if fallback_result is not None:
+        return fallback_result
+    if last_error is not None:
+        raise last_error
+    raise AIError("Hedged call exceeded its deadline")
+
+
+_END = object()
+
+
+def iterate_with_deadline(iterable: Iterable[T], timeout_s: Optional[float]) -> Iterator[T]:
+    """
+    Yield from `iterable` (read on a daemon thread) and raise AIError once
+    `timeout_s` has passed, even while waiting for the next item, so a
+    stalled stream is cut off. The reader stops after its current item.
+    """
+    if not timeout_s:
+        yield from iterable
+        return
+
+    chunks: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+
+    def _read() -> None:
+        try:
+            for chunk in iterable:
+                if stop.is_set():
+                    return
+                chunks.put((chunk, None))
+        except BaseException as e:
+            chunks.put((_END, e))
+            return
+        chunks.put((_END, None))
+
+    threading.Thread(target=_read, name="stream-reader", daemon=True).start()
+    deadline = time.monotonic() + timeout_s
+    try:
+        while True:
+            try:
+                chunk, error = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise AIError(f"Stream exceeded deadline of {timeout_s:.1f}s")
+            if chunk is _END:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        stop.set()
@@ -0,0 +1,130 @@
+"""
+Confidence-based tiered extraction router.
+
+Tier 1 : local OCR (cheap, offline)
+Tier 2 : Gemini (remote), only when tier-1 confidence < threshold
+
+The routing decision and per-tier timings are stored in
+`receipt.meta["routing"]` and aggregated in `TieredRouterModel.stats()`.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+from PIL import Image
+
+from modules.data.receipt_data import ItemData, ReceiptData
+from modules.models.base import AIModel
+
+
+CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.9"))
+
+
+# Confidence Scoring
+
+def score_confidence(receipt: ReceiptData) -> float:
+    """
+    Score a local extraction between 0 and 1.
+
+    - Item prices summing to the printed total is the main signal.
+    - Items with non-positive prices or names without letters lower the score.
+    """
+    items = list(receipt.items.values())
+    if not items:
+        return 0.0
+
+    detected_total = (receipt.meta or {}).get("detected_total")
+    if not detected_total:
+        total_score = 0.3  # no printed total to check against
+    else:
+        subtotal = sum(it.price for it in items)
+        total_score = max(0.0, 1.0 - abs(subtotal - detected_total) / detected_total)
+
+    valid = sum(1 for it in items if it.price > 0 and any(c.isalpha() for c in it.name))
+    return round(total_score * valid / len(items), 3)
+
+
+# Router Model
+
+class TieredRouterModel(AIModel):
+    """Run the local tier first and escalate to the remote tier on low confidence."""
+
+    def __init__(self, local: AIModel, remote_name: str = "Gemini", threshold: float = CONFIDENCE_THRESHOLD):
+        self.model_name = "Auto"
+        self.local = local
+        self.remote_name = remote_name
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._stats = {"local": 0, "escalated": 0, "local_ms": 0.0, "remote_ms": 0.0}
+
+    def _remote(self) -> AIModel:
+        from modules.models.loader import ModelNames, model_registry
+        return model_registry.get(ModelNames(self.remote_name))
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        # Prefer the guarded remote path: no hedge/fallback back to local OCR
+        return self._route(image, lambda remote: getattr(remote, "run_remote", remote.run)(image))
+
+    def run_streaming(self, image: Image.Image, on_item: Callable[[ItemData], None]) -> ReceiptData:
+        """Local tier emits at the end; an escalated Gemini call streams its items."""
+        def _escalate(remote: AIModel) -> ReceiptData:
+            if hasattr(remote, "run_remote"):
+                return remote.run_streaming(image, on_item, fallback=False)
+            return remote.run_streaming(image, on_item)
+
+        receipt = self._route(image, _escalate)
+        if receipt.meta["routing"]["tier"] == "local":
+            for item in receipt.items.values():
+                on_item(item)
+        return receipt
+
+    def _route(self, image: Image.Image, escalate: Callable[[AIModel], ReceiptData]) -> ReceiptData:
+        start = time.perf_counter()
+        receipt = self.local.run(image)
+        local_ms = (time.perf_counter() - start) * 1000
+        confidence = score_confidence(receipt)
+
+        routing = {
+            "tier": "local",
+            "confidence": confidence,
+            "threshold": self.threshold,
+            "timings_ms": {"local": round(local_ms, 1)},
+        }
+
+        if confidence < self.threshold:
+            start = time.perf_counter()
+            try:
+                receipt = escalate(self._remote())
+                routing["tier"] = "remote"
+            except Exception as e:
+                # Remote tier unavailable (e.g. no API key): keep local result
+                print(f"Router escalation failed: {e}")
+                routing["error"] = str(e)
+            routing["timings_ms"]["remote"] = round((time.perf_counter() - start) * 1000, 1)
+
+        self._record(routing)
+        receipt.meta["routing"] = routing
+        print(f"Router → {routing['tier']} (confidence {confidence:.2f}, {routing['timings_ms']})")
+        return receipt
+
+    # Stats
+
+    def _record(self, routing: dict) -> None:
+        with self._lock:
+            if routing["tier"] == "remote":
+                self._stats["escalated"] += 1
+            else:
+                self._stats["local"] += 1
+            self._stats["local_ms"] += routing["timings_ms"].get("local", 0.0)
+            self._stats["remote_ms"] += routing["timings_ms"].get("remote", 0.0)
+
+    def stats(self) -> Dict[str, float]:
+        """Routing counters and average latency per tier."""
+        with self._lock:
+            s = dict(self._stats)
+        calls = s["local"] + s["escalated"]
+        s["avg_local_ms"] = round(s["local_ms"] / calls, 1) if calls else 0.0
+        s["avg_remote_ms"] = round(s["remote_ms"] / s["escalated"], 1) if s["escalated"] else 0.0
+        return s
@@ -1,59 +1,232 @@
+"""
+Automatic item assignment.
+
+- balance_items   : give every item to one participant so spending ends up
+                    as close as possible to each participant's target
+- AutoSplitEngine : runs the balanced / equal / history-suggested split
+                    on a SplitManager
+
+Balancing is deterministic: a greedy LPT pass (largest price first, to
+whoever is furthest below target) followed by a local search that moves
+or swaps single items between the most over- and under-target
+participants while that lowers the squared deviation.
+"""
+
+import heapq
 from dataclasses import dataclass
-from typing import Dict, List
-import random
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from modules.data.allocation import Allocation, allocate
+from modules.data.assignment_data import SplitManager
+from modules.data.preference_index import MIN_SUPPORT, PreferenceIndex
+
+
+MAX_REFINE_ROUNDS = 2000
+MAX_PARTNERS = 32  # under-target participants tried per round
+TOLERANCE = 0.01  # stop refining once over/under gaps are below one cent
+EPSILON = 1e-9
+
+
+# Balancing
+
+def _lpt(prices: np.ndarray, targets: np.ndarray, loads: np.ndarray) -> np.ndarray:
+    """Greedy pass: biggest item first, to the participant furthest below target."""
+    owner = np.empty(len(prices), dtype=np.int64)
+    heap = [(loads[p] - targets[p], p) for p in range(len(targets))]
+    heapq.heapify(heap)
+    deviation = loads - targets
+
+    for i in np.argsort(-prices, kind="stable").tolist():
+        price = prices[i]
+        if price < 0:
+            # Discount lines go to whoever is most over target
+            p = int(deviation.argmax())
+        else:
+            while True:
+                dev, p = heapq.heappop(heap)
+                if dev == deviation[p]:
+                    break  # skip stale heap entries
+        deviation[p] += price
+        heapq.heappush(heap, (deviation[p], p))
+        owner[i] = p
+    return owner
+
+
+def _best_exchange(gap: float, give: np.ndarray, take: np.ndarray):
+    """
+    Best (index in give, index in take or -1 for a plain move) so that
+    give - take is as close as possible to gap / 2 while in (0, gap).
+    """
+    if not len(give):
+        return None
+    candidates = np.concatenate(([0.0], take))  # 0.0 = move without swapping back
+    order = np.argsort(candidates, kind="stable")
+    ordered = candidates[order]
+    pos = np.searchsorted(ordered, give - gap / 2)
+
+    best = None
+    for idx in (np.maximum(pos - 1, 0), np.minimum(pos, len(ordered) - 1)):
+        diff = give - ordered[idx]
+        score = np.where((diff > EPSILON) & (diff < gap - EPSILON), np.abs(diff - gap / 2), np.inf)
+        i = int(score.argmin())
+        if np.isfinite(score[i]) and (best is None or score[i] < best[0]):
+            best = (score[i], i, int(order[idx[i]]) - 1)
+    return None if best is None else best[1:]
+
+
+def _refine(prices: np.ndarray, owner: np.ndarray, deviation: np.ndarray, max_rounds: int) -> None:
+    """Local search: move / swap one item between an over- and an under-target participant."""
+    members: List[List[int]] = [[] for _ in range(len(deviation))]
+    for i, p in enumerate(owner.tolist()):
+        members[p].append(i)
+
+    for _ in range(max_rounds):
+        # Only participants holding movable items can give any away
+        # (preloaded `loads` may put someone over target with none)
+        holders = np.flatnonzero([bool(m) for m in members])
+        if not len(holders):
+            return
+        over = int(holders[deviation[holders].argmax()])
+        given = np.array(members[over], dtype=np.int64)
+        for under in np.argsort(deviation, kind="stable")[:MAX_PARTNERS].tolist():
+            gap = deviation[over] - deviation[under]
+            if gap <= TOLERANCE:
+                return
+            taken = np.array(members[under], dtype=np.int64)
+            found = _best_exchange(gap, prices[given], prices[taken])
+            if found is None:
+                continue
+            i, j = found
+            moved = int(given[i])
+            members[over].remove(moved)
+            members[under].append(moved)
+            owner[moved] = under
+            delta = prices[moved]
+            if j >= 0:
+                back = int(taken[j])
+                members[under].remove(back)
+                members[over].append(back)
+                owner[back] = over
+                delta -= prices[back]
+            deviation[over] -= delta
+            deviation[under] += delta
+            break
+        else:
+            return  # no pair can improve any more
+
+
+def balance_items(prices: np.ndarray, targets: np.ndarray, loads: Optional[np.ndarray] = None,
+                  max_rounds: int = MAX_REFINE_ROUNDS) -> np.ndarray:
+    """
+    Owner (participant index) for every item, so that `loads + spend`
+    per participant is as close as possible to `targets`.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    loads = np.zeros(len(targets)) if loads is None else np.asarray(loads, dtype=np.float64)
+    if not len(prices) or not len(targets):
+        return np.zeros(len(prices), dtype=np.int64)
+
+    owner = _lpt(prices, targets, loads)
+    spend = np.bincount(owner, weights=prices, minlength=len(targets))
+    _refine(prices, owner, loads + spend - targets, max_rounds)
+    return owner
+
+
+def budget_targets(total: float, participant_ids: List[str], budgets: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    Target spend per participant: equal shares, or `total` divided in
+    proportion to `budgets` (participants without a budget get the average).
+    """
+    if not budgets:
+        return np.full(len(participant_ids), total / max(len(participant_ids), 1))
+    given = [b for b in budgets.values() if b > 0]
+    fallback = sum(given) / len(given) if given else 1.0
+    weights = np.array([max(budgets.get(pid, fallback), 0.0) for pid in participant_ids], dtype=np.float64)
+    if weights.sum() <= 0:
+        weights[:] = 1.0
+    return total * weights / weights.sum()
 
-from modules.data.assignment_data import SplitManager, GroupData, ParticipantData
-from modules.data.receipt_data import ReceiptData
 
 # Auto Split Engine
 
 @dataclass
 class AutoSplitEngine:
-    """AI-assisted logic to auto-assign items to participants."""
+    """Auto-assign receipt items to participants through a SplitManager."""
 
     manager: SplitManager
 
-    # Rule-Based Split Recommendation
+    # Balanced Split
 
-    def run_auto_split(self) -> None:
-        """Automatically assign items to participants (AI heuristic)."""
-        participants = self.manager.get_all_participants()
-        items = self.manager.get_all_items()
+    def run_auto_split(self, budgets: Optional[Dict[str, float]] = None, only_unassigned: bool = False,
+                       apply: bool = True) -> Optional[Allocation]:
+        """
+        Give every item to one participant so spending is balanced
+        (or proportional to `budgets`, participant id → amount).
 
-        if not participants:
-            print("No participants found for auto split.")
-            return
+        With `only_unassigned`, items already assigned keep their
+        assignees and count toward each participant's spend.
+        Returns the allocation (applied to the manager unless `apply=False`).
+        """
+        manager = self.manager
+        pids = list(manager.participants)
+        if not pids:
+            return None
+
+        items = manager.unassigned_items() if only_unassigned else manager.get_all_items()
+        prices = np.fromiter((it.price for it in items), dtype=np.float64, count=len(items))
 
-        # Heuristic: distribute items evenly by category or index
-        category_map: Dict[str, List] = {}
-        for item in items:
-            category_map.setdefault(item.category, []).append(item)
+        loads = np.zeros(len(pids))
+        if only_unassigned:
+            current = manager.allocation().as_dict()
+            loads = np.array([current.get(pid, 0.0) for pid in pids])
 
-        # Assign each category block to random participant
-        for cat, cat_items in category_map.items():
-            assigned_to = random.choice(participants)
-            for it in cat_items:
-                assigned_to.assign_item(it, ratio=1.0)
-                print(f"Auto assigned {it.name} → {assigned_to.name}")
+        targets = budget_targets(float(prices.sum() + loads.sum()), pids, budgets)
+        owner = balance_items(prices, targets, loads)
+
+        weights = np.zeros((len(pids), len(items)))
+        weights[owner, np.arange(len(items))] = 1.0
+        result = allocate(weights, prices, pids, [it.id for it in items], manager.minor_unit)
+        if apply:
+            manager.apply_allocation(result)
+        return result
+
+    # Suggested Split (from history)
+
+    def run_history_split(self, index: PreferenceIndex, only_unassigned: bool = True,
+                          min_support: float = MIN_SUPPORT, apply: bool = True) -> Optional[Allocation]:
+        """
+        Pre-assign items the way this group usually splits them: each
+        item goes (shared equally) to the people who took it in at least
+        `min_support` of past receipts. Items without a clear pattern are
+        left alone. Returns None when nothing can be suggested.
+        """
+        manager = self.manager
+        pids = list(manager.participants)
+        items = manager.unassigned_items() if only_unassigned else manager.get_all_items()
+        if not pids or not items or not len(index):
+            return None
+
+        names = [manager.participants[pid].name for pid in pids]
+        weights = index.suggest_weights(names, [it.name for it in items], min_support)
+        keep = np.flatnonzero(weights.any(axis=0))
+        if not len(keep):
+            return None
+
+        prices = np.fromiter((it.price for it in items), dtype=np.float64, count=len(items))
+        result = allocate(weights[:, keep], prices[keep], pids, [items[i].id for i in keep], manager.minor_unit)
+        if apply:
+            manager.apply_allocation(result)
+        return result
 
     # Equal Split (Optional)
 
     def run_equal_split(self) -> None:
         """Evenly split all items among all participants."""
-        participants = self.manager.get_all_participants()
-        items = self.manager.get_all_items()
-
-        if not participants:
+        if not self.manager.participants:
             return
 
-        for item in items:
-            ratio = 1 / len(participants)
-            for p in participants:
-                p.assign_item(item, ratio)
-                print(f"{p.name} gets {ratio*100:.0f}% of {item.name}")
-
-    # Save Back to Manager
-
-    def update_manager(self) -> None:
-        """Re-attach the group data to SplitManager."""
-        self.manager.group_data = self.manager.group_data
\ No newline at end of file
+        # One share each per item; amounts come from the manager's share matrix
+        self.manager.split_equally()
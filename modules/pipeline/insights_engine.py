@@ -1,4 +1,5 @@
 import pandas as pd
+from modules.data.history_store import QUERY_TIMEOUT_S
 from modules.utils import format_number_to_currency
 
 # BASIC INSIGHTS + CHAT SUPPORT
@@ -77,6 +78,52 @@ def analyze_receipt_with_ai(receipt_dict: dict, query: str = None):
     return summary
 
 
+# SINGLE RECEIPT (fast path for ReceiptData objects)
+
+def summarize_receipt(receipt) -> pd.DataFrame:
+    """
+    Same columns as analyze_receipt_with_ai, computed from the receipt's
+    columnar item store (no to_dict / DataFrame rebuild).
+    """
+    summary = receipt.get_category_summary()
+    if summary.empty:
+        return summary
+
+    top_item = receipt.get_most_expensive()
+    summary["most_expensive"] = top_item.name
+    summary["most_expensive_price"] = top_item.price
+    summary["receipt_total"] = receipt.total
+    summary["num_items"] = len(receipt.items)
+    return summary
+
+
+# HISTORY INSIGHTS (many receipts, aggregated in the history store)
+
+def analyze_history(store, start: str, end: str) -> pd.DataFrame:
+    """
+    Summarize spending across all saved receipts between `start` and `end`
+    (YYYY-MM-DD, inclusive). Same columns as analyze_receipt_with_ai, plus
+    `num_receipts`; the aggregation runs in SQL, no receipt is loaded whole.
+    """
+    # Fire all queries first; they run on the store thread
+    categories_f = store.category_totals(start, end)
+    top_f = store.top_items(start, end, limit=1)
+    totals_f = store.summary(start, end)
+
+    summary = categories_f.result(timeout=QUERY_TIMEOUT_S)
+    if summary.empty:
+        return summary
+
+    top_item = top_f.result(timeout=QUERY_TIMEOUT_S).iloc[0]
+    totals = totals_f.result(timeout=QUERY_TIMEOUT_S).iloc[0]
+    summary["most_expensive"] = top_item["name"]
+    summary["most_expensive_price"] = top_item["price"]
+    summary["receipt_total"] = totals["total_spent"]
+    summary["num_items"] = int(totals["num_items"])
+    summary["num_receipts"] = int(totals["num_receipts"])
+    return summary
+
+
 # RECEIPT COMPARATOR
 
 def compare_receipts_ai(receipt_a: dict, receipt_b: dict) -> pd.DataFrame:
@@ -0,0 +1,162 @@
+"""
+Image preprocessing stage run before a receipt is uploaded to Gemini.
+
+Steps (all configurable):
+1. Auto-orient using EXIF rotation
+2. Crop to the bright paper area of the receipt
+3. Downsample to a target long edge (tall stacked / long receipts: target width)
+4. Convert to grayscale
+5. Encode as quality-tuned JPEG / WebP
+
+Bytes saved against the previous upload (the untouched image as PNG)
+are only measured with `measure_baseline`, since that costs one extra
+PNG encode per image; otherwise the payload is reported against the raw
+pixel buffer.
+"""
+
+import os
+
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image, ImageFilter, ImageOps
+
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+# Configuration
+
+@dataclass(frozen=True)
+class PreprocessConfig:
+    """Settings for the upload preprocessing stage."""
+
+    auto_orient: bool = True
+    crop: bool = True
+    max_long_edge: int = 1600
+    tall_ratio: float = 2.0  # height/width above this (stacked pages): cap the width instead
+    grayscale: bool = True
+    format: str = "JPEG"  # JPEG | WEBP | PNG
+    quality: int = 80
+    paper_threshold: int = 150  # min brightness treated as receipt paper
+    min_crop_ratio: float = 0.2  # skip crop if detected area is implausibly small
+    measure_baseline: bool = os.getenv("PREPROCESS_MEASURE_BASELINE", "0") == "1"  # extra PNG encode
+
+    def signature(self) -> str:
+        """Short string identifying the output-affecting settings (for cache keys)."""
+        return (
+            f"o{int(self.auto_orient)}c{int(self.crop)}e{self.max_long_edge}t{self.tall_ratio:g}"
+            f"g{int(self.grayscale)}{self.format.lower()}q{self.quality}"
+        )
+
+
+@dataclass
+class PreprocessResult:
+    """Encoded payload plus size report."""
+
+    data: bytes
+    mime_type: str
+    size: tuple
+    raw_pixel_bytes: int  # uncompressed pixel buffer of the input (not a previous encoding)
+    encoded_bytes: int
+    baseline_bytes: Optional[int] = None  # input as PNG, only with measure_baseline
+
+    @property
+    def bytes_saved(self) -> Optional[int]:
+        """Bytes saved against the previous PNG upload (None when not measured)."""
+        return None if self.baseline_bytes is None else self.baseline_bytes - self.encoded_bytes
+
+    @property
+    def raw_ratio(self) -> float:
+        """Encoded payload size as a fraction of the raw pixel buffer."""
+        return self.encoded_bytes / self.raw_pixel_bytes if self.raw_pixel_bytes else 1.0
+
+
+# Pipeline Steps
+
+def crop_to_receipt(image: Image.Image, config: PreprocessConfig) -> Image.Image:
+    """Crop to the bounding box of bright (paper) pixels."""
+    probe = image.convert("L")
+    probe.thumbnail((256, 256))
+    scale_x = image.width / probe.width
+    scale_y = image.height / probe.height
+
+    # Threshold + min filter removes small bright specks outside the receipt
+    mask = probe.point(lambda p: 255 if p >= config.paper_threshold else 0)
+    mask = mask.filter(ImageFilter.MinFilter(5))
+    bbox = mask.getbbox()
+    if not bbox:
+        return image
+
+    left, top, right, bottom = bbox
+    area = (right - left) * (bottom - top)
+    if area < config.min_crop_ratio * probe.width * probe.height:
+        return image
+
+    # Small margin so the edge text is not clipped
+    pad = 2
+    box = (
+        max(0, int((left - pad) * scale_x)),
+        max(0, int((top - pad) * scale_y)),
+        min(image.width, int((right + pad) * scale_x)),
+        min(image.height, int((bottom + pad) * scale_y)),
+    )
+    return image.crop(box)
+
+
+def downsample(image: Image.Image, max_long_edge: int, tall_ratio: float = 0.0) -> Image.Image:
+    """
+    Resize so the longer side is at most `max_long_edge` pixels.
+
+    Images taller than `tall_ratio` widths (several photos stacked, very
+    long receipts) are limited by width instead; shrinking those by the
+    long edge would leave the text a few pixels high.
+    """
+    if tall_ratio and image.height > tall_ratio * image.width:
+        edge = image.width
+    else:
+        edge = max(image.size)
+    if not max_long_edge or edge <= max_long_edge:
+        return image
+    scale = max_long_edge / edge
+    new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(new_size, Image.Resampling.LANCZOS)
+
+
+def preprocess_image(image: Image.Image, config: PreprocessConfig = PreprocessConfig()) -> PreprocessResult:
+    """Run the full preprocessing stage and return the encoded payload."""
+    raw_pixel_bytes = image.width * image.height * len(image.getbands())
+    baseline_bytes = None
+    if config.measure_baseline:
+        baseline = BytesIO()
+        image.save(baseline, format="PNG")
+        baseline_bytes = len(baseline.getvalue())
+
+    if config.auto_orient:
+        image = ImageOps.exif_transpose(image)
+    if config.crop:
+        image = crop_to_receipt(image, config)
+    image = downsample(image, config.max_long_edge, config.tall_ratio)
+
+    if config.grayscale:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    fmt = config.format.upper()
+    buf = BytesIO()
+    if fmt == "PNG":
+        image.save(buf, format="PNG", optimize=True)
+    else:
+        image.save(buf, format=fmt, quality=config.quality, optimize=True)
+
+    data = buf.getvalue()
+    return PreprocessResult(
+        data=data,
+        mime_type=MIME_TYPES.get(fmt, "application/octet-stream"),
+        size=image.size,
+        raw_pixel_bytes=raw_pixel_bytes,
+        encoded_bytes=len(data),
+        baseline_bytes=baseline_bytes,
+    )
@@ -0,0 +1,95 @@
+"""
+Incremental JSON parser for streamed Gemini receipt answers.
+
+The model streams text like:
+    ```json
+    {"menus": [{"name": "Latte", "price": 25000}, {"name": ...
+    ...], "total": 45000}
+
+`IncrementalMenuParser.feed()` returns each `menus` element as soon as
+its closing brace arrives, so items can be shown before the answer ends.
+"""
+
+import json
+import re
+from typing import List, Optional
+
+
+TOTAL_PATTERN = re.compile(r'"total"\s*:\s*"?(-?[\d.]+)')
+
+
+class IncrementalMenuParser:
+    """Emit completed objects of the top-level `menus` array while text streams in."""
+
+    def __init__(self, array_key: str = "menus"):
+        self.array_key = f'"{array_key}"'
+        self.buffer = ""
+        self._pos = 0  # next character to scan
+        self._in_array = False
+        self._array_done = False
+        self._depth = 0
+        self._obj_start: Optional[int] = None
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[dict]:
+        """Add streamed text; return newly completed menu objects."""
+        self.buffer += text
+        completed = []
+
+        if not self._in_array and not self._array_done:
+            key_at = self.buffer.find(self.array_key, self._pos)
+            if key_at < 0:
+                return completed
+            open_at = self.buffer.find("[", key_at + len(self.array_key))
+            if open_at < 0:
+                return completed
+            self._in_array = True
+            self._pos = open_at + 1
+
+        if not self._in_array:
+            return completed
+
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        completed.append(json.loads(buf[self._obj_start:i + 1]))
+                    except ValueError:
+                        pass  # malformed element: skip it, keep streaming
+                    self._obj_start = None
+            elif ch == "]" and self._depth == 0:
+                self._in_array = False
+                self._array_done = True
+                i += 1
+                break
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def result(self) -> dict:
+        """Parse the full answer once streaming has finished."""
+        clean = self.buffer.replace("```json", "").replace("```", "").strip()
+        try:
+            return json.loads(clean)
+        except ValueError:
+            match = TOTAL_PATTERN.search(self.buffer)
+            return {"total": float(match.group(1))} if match else {}
@@ -0,0 +1,140 @@
+"""
+Tiling helpers for long and multi-page receipts.
+
+- stack_pages   : join several photos of one receipt into a single tall image
+- split_into_strips : cut a tall image into overlapping horizontal strips
+- merge_strip_lines : join OCR lines per strip, dropping duplicated overlap lines
+- ocr_tiled     : OCR all strips in a process pool and merge the result
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from typing import Callable, List, Optional
+
+from PIL import Image
+
+
+STRIP_HEIGHT = int(os.getenv("OCR_STRIP_HEIGHT", "1200"))
+STRIP_OVERLAP = int(os.getenv("OCR_STRIP_OVERLAP", "150"))
+MIN_TILE_HEIGHT = int(os.getenv("OCR_MIN_TILE_HEIGHT", "2000"))
+MAX_OVERLAP_LINES = 6
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Process pool shared by all sessions (created on first use).
+    Uses `spawn`: forking the multithreaded Streamlit server can copy
+    locks held by other threads into the children.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=os.cpu_count() or 2, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+# Image Helpers
+
+def stack_pages(images: List[Image.Image]) -> Image.Image:
+    """Stack receipt photos vertically (top to bottom) on a white canvas."""
+    if len(images) == 1:
+        return images[0]
+    pages = [img.convert("RGB") for img in images]
+    width = max(p.width for p in pages)
+    canvas = Image.new("RGB", (width, sum(p.height for p in pages)), "white")
+    y = 0
+    for page in pages:
+        canvas.paste(page, (0, y))
+        y += page.height
+    return canvas
+
+
+def needs_tiling(image: Image.Image, min_height: int = MIN_TILE_HEIGHT) -> bool:
+    """Tall, narrow images benefit from strip-wise OCR."""
+    return image.height > min_height and image.height > 1.5 * image.width
+
+
+def split_into_strips(
+    image: Image.Image, strip_height: int = STRIP_HEIGHT, overlap: int = STRIP_OVERLAP
+) -> List[Image.Image]:
+    """Cut image into horizontal strips; neighbours share `overlap` pixels."""
+    if image.height <= strip_height:
+        return [image]
+    step = max(1, strip_height - overlap)
+    strips = []
+    top = 0
+    while True:
+        bottom = min(image.height, top + strip_height)
+        strips.append(image.crop((0, top, image.width, bottom)))
+        if bottom >= image.height:
+            break
+        top += step
+    return strips
+
+
+# Line Merging
+
+def _norm(line: str) -> str:
+    return " ".join(line.lower().split())
+
+
+def _same_line(a: str, b: str) -> bool:
+    a, b = _norm(a), _norm(b)
+    return a == b or SequenceMatcher(None, a, b).ratio() >= 0.85
+
+
+def _overlap_length(tail: List[str], head: List[str], max_overlap: int) -> int:
+    """Largest k where the last k lines of `tail` match the first k of `head`."""
+    for k in range(min(max_overlap, len(tail), len(head)), 0, -1):
+        if all(_same_line(x, y) for x, y in zip(tail[-k:], head[:k])):
+            return k
+    return 0
+
+
+def merge_strip_lines(strip_lines: List[List[str]], max_overlap: int = MAX_OVERLAP_LINES) -> List[str]:
+    """Concatenate per-strip lines, removing lines repeated in the overlap.
+
+    A text line cut by a strip edge is OCR'd as garbage, so the match may
+    skip one trailing line of the previous strip and one leading line of
+    the next; both half-lines are dropped.
+    """
+    merged: List[str] = []
+    for lines in strip_lines:
+        best = (0, 0, 0)  # (k, skip_tail, skip_head)
+        for skip_tail in (0, 1):
+            for skip_head in (0, 1):
+                tail = merged[:len(merged) - skip_tail]
+                k = _overlap_length(tail, lines[skip_head:], max_overlap)
+                if k > best[0]:
+                    best = (k, skip_tail, skip_head)
+
+        k, skip_tail, skip_head = best
+        if k:
+            del merged[len(merged) - skip_tail:]
+            merged.extend(lines[skip_head + k:])
+        else:
+            merged.extend(lines)
+    return merged
+
+
+# Parallel OCR
+
+def ocr_tiled(image: Image.Image, image_to_lines: Callable[[Image.Image], List[str]]) -> List[str]:
+    """OCR strips in parallel processes and return the merged lines.
+
+    `image_to_lines` must be a module-level function (picklable).
+    """
+    strips = split_into_strips(image)
+    if len(strips) == 1:
+        return image_to_lines(image)
+    results = list(_get_pool().map(image_to_lines, strips))
+    return merge_strip_lines(results)
@@ -28,6 +28,22 @@ CURRENCY_LIST = {
 }
 
 
+def get_minor_unit(currency: str = "IDR") -> float:
+    """
+    Smallest amount a bill is split into for `currency` (0.01 USD, 1 JPY).
+    Uses CLDR cash digits when they are coarser (IDR is paid in whole rupiah).
+    """
+    try:
+        from babel.core import get_global
+        from babel.numbers import get_currency_precision
+        digits = get_currency_precision(currency)
+        fractions = get_global("currency_fractions")
+        cash_digits = fractions.get(currency, fractions["DEFAULT"])[2]
+        return 10.0 ** -min(digits, cash_digits)
+    except Exception:
+        return 0.01
+
+
 def format_number_to_currency(value: float, currency: str = "IDR") -> str:
     """Format float number to readable currency string."""
     try:
@@ -1,9 +1,14 @@
 import streamlit as st
 from PIL import Image
-import pickle, os
+import hashlib
 import pandas as pd
 
-from modules.models.gemini import GeminiModel
+from modules.data import session_data
+from modules.data.history_store import get_history_store
+from modules.data.receipt_store import save_receipt
+from modules.models.learned_classifier import record_corrections
+from modules.models.loader import get_model_instance
+from modules.pipeline.tiling import stack_pages
 from modules.utils import format_currency
 
 
@@ -18,41 +23,76 @@ def controller():
 
     # Upload Section
 
-    uploaded_file = st.file_uploader(
-        "Upload a receipt image (JPG / PNG):",
+    uploaded_files = st.file_uploader(
+        "Upload a receipt image (JPG / PNG) — add several photos for long receipts, top to bottom:",
         type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True,
     )
 
-    if not uploaded_file:
+    if not uploaded_files:
         st.info("Please upload your receipt image to begin.")
         return
 
     # Display Preview
 
-    image = Image.open(uploaded_file)
-    st.image(image, caption="🧾 Uploaded Receipt", use_container_width=True)
+    pages = [Image.open(f) for f in uploaded_files]
+    if len(pages) == 1:
+        st.image(pages[0], caption="🧾 Uploaded Receipt", use_container_width=True)
+    else:
+        st.image(pages, caption=[f"🧾 Part {i + 1}" for i in range(len(pages))], width=220)
+    image = stack_pages(pages)
     st.markdown("---")
 
-    # Run Gemini AI for Extraction
+    # Run Selected AI Model for Extraction (once per upload; reruns reuse the draft)
 
-    with st.spinner("🤖 Reading receipt using Gemini AI..."):
-        try:
-            model = GeminiModel()
-            receipt = model.run(image)
-        except Exception as e:
-            st.error(f"Failed to read receipt: {e}")
-            return
+    model_name = session_data.model_name.get()
+    upload_key = hashlib.sha1(
+        b"".join(f.getvalue() for f in uploaded_files) + model_name.value.encode("utf-8")
+    ).hexdigest()
+    draft = session_data.draft_receipt.get()
+
+    if not draft or draft["key"] != upload_key:
+        live_table = st.empty()
+        streamed_rows = []
+
+        def show_item(item):
+            """Render rows progressively while the model is still streaming."""
+            streamed_rows.append({"name": item.name, "price": item.price, "category": item.category})
+            live_table.dataframe(pd.DataFrame(streamed_rows), use_container_width=True, hide_index=True)
+
+        with st.spinner(f"🤖 Reading receipt using {model_name.value} AI..."):
+            try:
+                model = get_model_instance(model_name)
+                extracted = model.run_streaming(image, on_item=show_item)
+            except Exception as e:
+                st.error(f"Failed to read receipt: {e}")
+                return
+        live_table.empty()
+        draft = {"key": upload_key, "receipt": extracted, "version": 0}
+        session_data.draft_receipt.set(draft)
+
+    receipt = draft["receipt"]
 
     # Display Extracted Result (Editable)
 
     st.success("Receipt successfully analyzed by AI!")
 
-    df = receipt.to_dataframe().copy()
+    routing = receipt.meta.get("routing")
+    if routing:
+        tier = "Local OCR" if routing["tier"] == "local" else "Gemini"
+        timings = " · ".join(f"{k}: {v:.0f} ms" for k, v in routing["timings_ms"].items())
+        st.caption(f"⚡ Routed to **{tier}** (confidence {routing['confidence']:.0%}) — {timings}")
+
+    # Index = item keys, so editor row positions map back to items
+    item_keys = list(receipt.items.keys())
+    df = receipt.to_dataframe()
+    df.index = item_keys
 
     st.info("✏️ You can edit the table below if AI misread any items (e.g., wrong name, price, or category).")
 
-    # Editable Table
-    edited_df = st.data_editor(
+    # Editable Table (key changes after each save → editor starts from the patched receipt)
+    editor_key = f"editable_receipt_table_{draft['version']}"
+    st.data_editor(
         df,
         use_container_width=True,
         hide_index=True,
@@ -62,35 +102,46 @@ def controller():
             "price": st.column_config.NumberColumn("Price", format="Rp %d"),
             "category": st.column_config.TextColumn("Category")
         },
-        key="editable_receipt_table",
+        disabled=["receipt_id"],
+        key=editor_key,
     )
 
-    # Update Edited Data
+    # Update Edited Data (edit delta from the editor, no full-table compare)
 
-    if not edited_df.equals(df):
+    delta = st.session_state.get(editor_key) or {}
+    if delta.get("edited_rows") or delta.get("added_rows") or delta.get("deleted_rows"):
         st.info("💾 You have unsaved edits — click the button below to apply changes.")
         if st.button("💾 Save Edits", type="primary"):
             try:
-                # Update ke objek receipt
-                receipt.items.clear()
-                for _, row in edited_df.iterrows():
-                    # pastikan field tetap sinkron
-                    receipt.add_item(
-                        name=str(row["name"]),
-                        price=float(row["price"]),
-                        category=str(row["category"])
-                    )
-
-                # Recalculate total/subtotal jika ada fungsi internal
-                if hasattr(receipt, "recalculate_total"):
-                    receipt.recalculate_total()
-
-                # Save ulang ke file cache
-                os.makedirs("data", exist_ok=True)
-                with open("data/temp_receipt.pkl", "wb") as f:
-                    pickle.dump(receipt, f)
-
-                st.success("Edits saved successfully!")
+                # Patch hanya baris yang berubah; item lain tetap (id & assignment aman)
+                changes = receipt.apply_edits(
+                    item_keys,
+                    edited_rows=delta.get("edited_rows"),
+                    added_rows=delta.get("added_rows"),
+                    deleted_rows=delta.get("deleted_rows"),
+                )
+
+                # Item yang dihapus → lepas dari assignment peserta
+                manager = session_data.split_manager.get()
+                for item_id in changes["deleted"]:
+                    for pid in manager.get_assignees(item_id):
+                        manager.remove_assignment(pid, item_id)
+
+                # Kategori yang dikoreksi user → data latih classifier
+                if changes["corrections"]:
+                    record_corrections(changes["corrections"])
+
+                # Save ulang ke file cache (atomic, skip kalau tidak berubah)
+                save_receipt(receipt)
+
+                # Sudah di-confirm → update history (rollup ikut di-patch)
+                if session_data.uploaded_receipt.get() is receipt:
+                    split = manager if st.session_state.get("split_confirmed") else None
+                    get_history_store().save_receipt(receipt, split)
+
+                draft["version"] += 1
+                st.toast("Edits saved successfully!")
+                st.rerun()
             except Exception as e:
                 st.error(f"Failed to apply edits: {e}")
 
@@ -110,9 +161,9 @@ def controller():
         if st.button("Confirm & Continue", use_container_width=True):
             st.session_state["uploaded_receipt"] = receipt
             st.session_state["receipt_uploaded"] = True
-
-            os.makedirs("data", exist_ok=True)
-            with open("data/temp_receipt.pkl", "wb") as f:
-                pickle.dump(receipt, f)
+            # Async, upserts on re-confirm (sets meta history_key); keep an already-confirmed split
+            split = session_data.split_manager.get() if st.session_state.get("split_confirmed") else None
+            get_history_store().save_receipt(receipt, split)
+            save_receipt(receipt)
 
             st.success("Receipt confirmed and saved! You can now move to 'Assign Participants' page.")
\ No newline at end of file
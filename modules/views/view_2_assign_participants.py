@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
 from modules.data import session_data
+from modules.data.history_store import get_history_store
 from modules.data.assignment_data import GroupData, SplitManager, ParticipantData
-from modules.utils import format_currency
+from modules.data.preference_index import get_preference_index
+from modules.pipeline.auto_split import AutoSplitEngine
+from modules.utils import format_currency, get_current_currency, get_minor_unit
 
 
 def controller():
@@ -28,6 +31,7 @@ def controller():
         session_data.split_manager.set(manager)
 
     manager.receipt_items = receipt.items
+    manager.minor_unit = get_minor_unit(get_current_currency())  # IDR / JPY split in whole units
 
     # Add Participants
     st.subheader("➕ Add Participants")
@@ -64,43 +68,59 @@ def controller():
     st.subheader("Assign Items to Participants")
 
     all_items = list(receipt.items.values())
+    item_names = {it.id: it.name for it in all_items}
+
+    # Saran dari split sebelumnya (grup yang sama biasanya pesan yang sama)
+    engine = AutoSplitEngine(manager)
+    try:
+        suggestion = engine.run_history_split(get_preference_index(), apply=False)
+    except Exception as e:
+        print(f"Split suggestions unavailable: {e}")
+        suggestion = None
+    if suggestion is not None:
+        st.info(f"💡 {len(suggestion.item_ids)} unassigned item(s) can be pre-assigned from past splits.")
+        if st.button("Apply suggested split"):
+            manager.apply_allocation(suggestion)
+            session_data.split_manager.set(manager)
+            st.rerun()
 
     for pid, participant in manager.participants.items():
         st.markdown(f"### 👤 {participant.name}")
 
-        # Ambil assigned items dari state
-        assigned_items = manager.get_assignments(pid)
-        assigned_ids = [a.item.id for a in assigned_items]
-        available_items = [it for it in all_items if it.id not in assigned_ids]
+        # Item yang belum di-assign ke peserta ini (lookup set, bukan list)
+        available_items = manager.available_items(pid)
 
         with st.form(f"assign_form_{pid}", clear_on_submit=True):
-            selected_item = st.selectbox(
+            selected_id = st.selectbox(
                 f"Select item for {participant.name}",
-                ["— Select —"] + [it.name for it in available_items],
+                [None] + [it.id for it in available_items],
+                format_func=lambda item_id: "— Select —" if item_id is None else item_names[item_id],
                 key=f"select_{pid}"
             )
             assign_btn = st.form_submit_button("Assign")
 
             if assign_btn:
-                if selected_item == "— Select —":
+                if selected_id is None:
                     st.error("Please select a valid item.")
                 else:
-                    # Temukan item berdasarkan nama
-                    target = next(
-                        (it for it in all_items if it.name.strip().lower() == selected_item.strip().lower()),
-                        None
-                    )
-                    if target:
-                        manager.assign_item(pid, target.id)
-                        session_data.split_manager.set(manager)
-                        st.success(f"Assigned **{selected_item}** to **{participant.name}**")
-                        st.rerun()
+                    manager.assign_item(pid, selected_id)
+                    session_data.split_manager.set(manager)
+                    st.success(f"Assigned **{item_names[selected_id]}** to **{participant.name}**")
+                    st.rerun()
 
         # Tampilkan hasil assignment langsung
         assigned_items = manager.get_assignments(pid)
         if assigned_items:
             table = pd.DataFrame(
-                [{"Item": a.item.name, "Price": format_currency(a.item.price)} for a in assigned_items]
+                [
+                    {
+                        "Item": a.item.name,
+                        "Price": format_currency(a.item.price),
+                        "Share": f"{a.share:.0%}",
+                        "Amount": format_currency(a.total_price),
+                    }
+                    for a in assigned_items
+                ]
             )
             st.table(table)
         else:
@@ -110,7 +130,7 @@ def controller():
 
     # Validation Section
     total_items = len(all_items)
-    total_assigned = sum(len(v) for v in manager.participant_assignments.values())
+    total_assigned = total_items - manager.unassigned_count
 
     if total_assigned == total_items:
         st.success("All items assigned successfully!")
@@ -122,4 +142,5 @@ def controller():
     # Confirm Split
     if st.button("Confirm Split", type="primary", disabled=(total_assigned < total_items)):
         st.session_state["split_confirmed"] = True
+        get_history_store().save_receipt(receipt, manager)  # simpan ke history (background thread)
         st.success("Split confirmed! Proceed to the report page.")
\ No newline at end of file
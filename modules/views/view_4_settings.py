@@ -4,7 +4,7 @@ from dotenv import load_dotenv, set_key
 from babel.numbers import get_currency_name
 
 from modules.data import session_data
-from modules.models.loader import ModelNames
+from modules.models.loader import ModelNames, model_registry
 from modules.utils import CURRENCY_LIST
 
 # Load environment variables
@@ -50,7 +50,7 @@ def controller():
 
     # Secure API Key Handling (Hidden)
 
-    if model_choice == ModelNames.GEMINI:
+    if model_choice in (ModelNames.GEMINI, ModelNames.AUTO):
         st.subheader("🔐 Google API Key (Secure Storage)")
         st.caption("For privacy, your saved key will never be displayed. You can replace it anytime.")
 
@@ -74,14 +74,14 @@ def controller():
     if st.button("Apply Settings", use_container_width=True, type="primary"):
         # Update session data
         session_data.currency.set(selected_currency)
-        if model_choice != session_data.model_name.get():
-            session_data.model.reset()
         session_data.model_name.set(model_choice)
 
         # Store new API key securely
         if new_key.strip():
             set_key(".env", "GOOGLE_API_KEY", new_key.strip())
             os.environ["GOOGLE_API_KEY"] = new_key.strip()
+            # Rebuild Gemini client with the new key on next use
+            model_registry.invalidate(ModelNames.GEMINI)
             st.success("Google API Key securely saved to .env file.")
         elif model_choice == ModelNames.GEMINI and not key_is_set:
             st.error("❌ Gemini model requires a valid API key.")
@@ -98,7 +98,7 @@ def controller():
     st.write(f"**Currency:** {selected_currency} ({get_currency_name(selected_currency)})")
     st.write(f"**AI Model:** {model_choice.value}")
 
-    if model_choice == ModelNames.GEMINI:
+    if model_choice in (ModelNames.GEMINI, ModelNames.AUTO):
         if os.getenv("GOOGLE_API_KEY"):
             st.caption("🔐 Google API Key: **Configured (hidden for security)**")
         else:
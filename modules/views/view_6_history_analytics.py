@@ -1,12 +1,13 @@
-import os
-import pickle
+from datetime import date, timedelta
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
 from modules.data import session_data
-from modules.data.receipt_data import ReceiptData, ItemData
-from modules.pipeline.insights_engine import analyze_receipt_with_ai
+from modules.data.history_store import QUERY_TIMEOUT_S, get_history_store
+from modules.data.receipt_store import load_receipt, save_receipt
+from modules.pipeline.insights_engine import analyze_history, summarize_receipt
 from modules.utils import format_number_to_currency
 
 
@@ -15,45 +16,69 @@ from modules.utils import format_number_to_currency
 
 def load_latest_receipt():
     """
-    Load receipt safely from session or fallback JSON/pickle cache.
-    Uses dict serialization to prevent PicklingError on Streamlit reload.
+    Load receipt from session, or fall back to the last saved receipt file.
+    The file is only rewritten when the receipt changed.
     """
     receipt = session_data.uploaded_receipt.get()
 
-    # Save latest receipt to cache as dict
+    # Save latest receipt (no-op when unchanged)
     if receipt:
-        os.makedirs("data", exist_ok=True)
-        with open("data/temp_receipt.pkl", "wb") as f:
-            pickle.dump(receipt.to_dict(), f) 
+        save_receipt(receipt)
         return receipt
 
     # Fallback: load last saved receipt
-    if os.path.exists("data/temp_receipt.pkl"):
-        try:
-            with open("data/temp_receipt.pkl", "rb") as f:
-                data = pickle.load(f)
-
-            # Rebuild object only if dict structure is valid
-            if isinstance(data, dict) and "items" in data:
-                items = {
-                    f"item_{i:03d}": ItemData(
-                        d.get("name", ""),
-                        d.get("price", 0),
-                        d.get("category", "Others"),
-                    )
-                    for i, d in enumerate(data.get("items", []))
-                }
-                receipt = ReceiptData(items=items, total=data.get("total", 0.0))
-                st.session_state["uploaded_receipt"] = receipt
-                st.info("📂 Loaded last uploaded receipt from local cache.")
-                return receipt
-            else:
-                st.warning("⚠️ Invalid cache format — please upload again.")
-        except Exception as e:
-            st.error(f"❌ Failed to load saved receipt: {e}")
-            return None
-
-    return None
+    try:
+        receipt = load_receipt()
+    except Exception as e:
+        st.error(f"❌ Failed to load saved receipt: {e}")
+        return None
+
+    if receipt is not None:
+        st.session_state["uploaded_receipt"] = receipt
+        st.info("📂 Loaded last uploaded receipt from local cache.")
+    return receipt
+
+
+# Range Options (days back; 0 = current receipt only, None = all history)
+
+HISTORY_RANGES = {
+    "Current receipt": 0,
+    "Last 30 days": 30,
+    "Last 3 months": 91,
+    "Last 12 months": 365,
+    "All history": None,
+}
+
+
+def load_history_summary(days):
+    """Aggregate saved receipts in the selected range (queries run on the store thread)."""
+    end = date.today()
+    start = end - timedelta(days=days) if days else date.min
+    store = get_history_store()
+    monthly_f = store.monthly_totals(start.isoformat(), end.isoformat())
+    participants_f = store.participant_totals(start.isoformat(), end.isoformat())
+    summary = analyze_history(store, start.isoformat(), end.isoformat())
+    return summary, monthly_f.result(timeout=QUERY_TIMEOUT_S), participants_f.result(timeout=QUERY_TIMEOUT_S)
+
+
+def show_month_tiles():
+    """This month vs last month, read from the monthly rollup (one row lookup each)."""
+    this_month = date.today().replace(day=1)
+    last_month = (this_month - timedelta(days=1)).replace(day=1)
+    store = get_history_store()
+    current_f = store.month_tile(this_month.strftime("%Y-%m"))
+    previous_f = store.month_tile(last_month.strftime("%Y-%m"))
+    current, previous = current_f.result(timeout=QUERY_TIMEOUT_S), previous_f.result(timeout=QUERY_TIMEOUT_S)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric(
+        "This month",
+        format_number_to_currency(current["total"]),
+        delta=format_number_to_currency(current["total"] - previous["total"]) if previous["n_receipts"] else None,
+        delta_color="inverse",
+    )
+    col2.metric("Last month", format_number_to_currency(previous["total"]))
+    col3.metric("Receipts this month", current["n_receipts"])
 
 
 # Main Analytics View
@@ -65,23 +90,42 @@ def show_analytics():
     st.caption("Visualize your spending breakdown, highlights, and AI insights.")
     st.markdown("---")
 
-    # Load receipt
-    receipt = load_latest_receipt()
-    if not receipt:
-        st.warning("⚠️ Please upload a receipt first.")
-        return
-
-    # Run AI-based analysis
     try:
-        df_summary = analyze_receipt_with_ai(receipt.to_dict())
+        show_month_tiles()
     except Exception as e:
-        st.error(f"❌ Failed to analyze receipt: {e}")
-        return
+        st.caption(f"History tiles unavailable: {e}")
+
+    range_label = st.selectbox("📅 Range", list(HISTORY_RANGES), key="analytics_range")
+    days = HISTORY_RANGES[range_label]
+    monthly = participants = None
+
+    if days == 0:
+        # Load receipt
+        receipt = load_latest_receipt()
+        if not receipt:
+            st.warning("⚠️ Please upload a receipt first.")
+            return
+
+        # Run analysis (columnar fast path)
+        try:
+            df_summary = summarize_receipt(receipt)
+        except Exception as e:
+            st.error(f"❌ Failed to analyze receipt: {e}")
+            return
+    else:
+        try:
+            df_summary, monthly, participants = load_history_summary(days)
+        except Exception as e:
+            st.error(f"❌ Failed to load history: {e}")
+            return
 
     if df_summary is None or df_summary.empty:
-        st.info("ℹ️ No items found in the current receipt.")
+        st.info("ℹ️ No items found in the current receipt." if days == 0 else "ℹ️ No saved receipts in this range yet.")
         return
 
+    if "num_receipts" in df_summary:
+        st.caption(f"🧾 {int(df_summary['num_receipts'].iloc[0])} receipts · {int(df_summary['num_items'].iloc[0])} items")
+
     # Category Breakdown (Pie Chart)
 
     st.subheader("💡 Category Breakdown")
@@ -98,6 +142,13 @@ def show_analytics():
     except Exception as e:
         st.warning(f"⚠️ Could not render pie chart: {e}")
 
+    # Monthly Trend (history ranges only)
+
+    if monthly is not None and len(monthly) > 1:
+        st.subheader("📅 Monthly Spending")
+        fig = px.bar(monthly, x="month", y="total_spent", color_discrete_sequence=["#2e7d32"])
+        st.plotly_chart(fig, use_container_width=True)
+
     #  Highlight — Most Expensive Item
 
     st.subheader("🏆 Highlight")
@@ -127,6 +178,14 @@ def show_analytics():
     total_spent = df_summary.get("receipt_total", pd.Series([0])).iloc[0]
     st.markdown(f"### 💰 Total Spent: {format_number_to_currency(total_spent)}")
 
+    # Participant Totals (history ranges only)
+
+    if participants is not None and not participants.empty:
+        st.subheader("👥 Spending per Participant")
+        df_people = participants.copy()
+        df_people["total_spent"] = df_people["total_spent"].apply(format_number_to_currency)
+        st.dataframe(df_people, use_container_width=True, hide_index=True)
+
     # AI Insights Summary
 
     st.markdown("---")
@@ -3,7 +3,8 @@ import pandas as pd
 import plotly.express as px
 from PIL import Image
 
-from modules.models.gemini import GeminiModel
+from modules.data import session_data
+from modules.models.loader import get_model_instance
 from modules.pipeline.insights_engine import compare_receipts_ai
 
 
@@ -27,27 +28,36 @@ def controller() -> bool:
 
     # Load or Extract Data
 
-    def read_receipt(file):
-        """Auto-detect format (JSON or image)."""
+    def read_json(file):
+        """Read a receipt exported as JSON."""
+        try:
+            return pd.read_json(file).to_dict()
+        except Exception as e:
+            st.error(f"Failed to read JSON: {e}")
+            return None
+
+    files = [file1, file2]
+    receipts = [None, None]
+    image_slots = []
+    for idx, file in enumerate(files):
         if file.name.lower().endswith(".json"):
-            try:
-                return pd.read_json(file).to_dict()
-            except Exception as e:
-                st.error(f"Failed to read JSON: {e}")
-                return None
+            receipts[idx] = read_json(file)
         else:
-            # Process image with AI model
-            try:
-                st.write("🤖 Analyzing receipt with Gemini AI...")
-                model = GeminiModel()
-                receipt_obj = model.run(Image.open(file))
-                return receipt_obj.to_dict()
-            except Exception as e:
-                st.error(f"❌ AI failed to read receipt: {e}")
-                return None
-
-    receipt1 = read_receipt(file1)
-    receipt2 = read_receipt(file2)
+            image_slots.append(idx)
+
+    if image_slots:
+        # Process all images concurrently with the selected AI model
+        try:
+            model_name = session_data.model_name.get()
+            st.write(f"🤖 Analyzing {len(image_slots)} receipt(s) with {model_name.value} AI...")
+            model = get_model_instance(model_name)
+            results = model.run_many([Image.open(files[idx]) for idx in image_slots])
+            for idx, receipt_obj in zip(image_slots, results):
+                receipts[idx] = receipt_obj.to_dict()
+        except Exception as e:
+            st.error(f"❌ AI failed to read receipt: {e}")
+
+    receipt1, receipt2 = receipts
 
     if not receipt1 or not receipt2:
         st.error("❌ Could not process both receipts. Please check your files.")
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from modules.data.allocation import allocate, largest_remainder
+from modules.utils import get_minor_unit
+
+
+def test_columns_add_up_to_prices():
+    rng = np.random.default_rng(7)
+    weights = rng.integers(0, 4, size=(7, 50)).astype(float)
+    weights[0, weights.sum(axis=0) == 0] = 1.0  # every item held by someone
+    prices = np.round(rng.uniform(0.01, 99.99, size=50), 2)
+
+    result = allocate(weights, prices, [f"p{i}" for i in range(7)], [f"i{j}" for j in range(50)])
+
+    np.testing.assert_allclose(result.amounts.sum(axis=0), prices, atol=1e-9)
+    assert result.totals.sum() == pytest.approx(prices.sum())
+    assert np.all(np.abs(result.amounts - result.shares * prices) < 0.01 + 1e-9)
+
+
+def test_equal_split_spreads_extra_cents():
+    # 10.00 three ways on three items: each person pays the extra cent once
+    result = allocate(np.ones((3, 3)), np.full(3, 10.0), ["a", "b", "c"], ["x", "y", "z"])
+    assert result.totals.tolist() == [10.0, 10.0, 10.0]
+    assert np.round(result.amounts.sum(axis=0), 2).tolist() == [10.0, 10.0, 10.0]
+
+
+def test_negative_lines_stay_exact():
+    weights = np.ones((3, 2))
+    result = allocate(weights, np.array([20.0, -5.0]), ["a", "b", "c"], ["meal", "discount"])
+    assert round(result.amounts[:, 1].sum(), 2) == -5.0
+    assert sorted(np.round(result.amounts[:, 1], 2).tolist()) == [-1.67, -1.67, -1.66]
+    assert round(result.totals.sum(), 2) == 15.0
+
+
+def test_unheld_items_stay_unallocated():
+    result = allocate(np.array([[1.0, 0.0]]), np.array([8.0, 3.0]), ["a"], ["x", "y"])
+    assert result.amounts.tolist() == [[8.0, 0.0]]
+
+
+def test_idr_splits_in_whole_rupiah():
+    minor_unit = get_minor_unit("IDR")
+    assert minor_unit == 1.0
+    result = allocate(np.ones((3, 1)), np.array([100000.0]), ["a", "b", "c"], ["x"], minor_unit)
+    assert sorted(result.amounts[:, 0].tolist()) == [33333.0, 33333.0, 33334.0]
+    assert result.totals.sum() == 100000.0
+
+
+def test_largest_remainder_gives_leftover_to_largest_fractions():
+    exact = np.array([[1.7], [1.2], [0.1]])
+    assert largest_remainder(exact, np.array([3])).ravel().tolist() == [2, 1, 0]
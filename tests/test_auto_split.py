@@ -0,0 +1,28 @@
+import numpy as np
+
+from modules.data.assignment_data import ParticipantData, SplitManager
+from modules.data.receipt_data import ReceiptData
+from modules.pipeline.auto_split import AutoSplitEngine, balance_items
+
+
+def test_balance_items_with_preloaded_loads():
+    # Participant 0 is already far over target and holds none of the movable items
+    owner = balance_items(np.array([5.0, 3.0]), targets=np.array([49.0, 49.0]), loads=np.array([90.0, 0.0]))
+    assert owner.tolist() == [1, 1]
+
+
+def test_auto_split_only_unassigned_keeps_existing_assignments():
+    receipt = ReceiptData.from_list(
+        [{"name": "Steak", "price": 90.0, "category": "Food"}, {"name": "Tea", "price": 5.0, "category": "Drink"}],
+        95.0,
+    )
+    alice, bob = ParticipantData("Alice"), ParticipantData("Bob")
+    manager = SplitManager([alice, bob], receipt.items)
+    steak, tea = list(receipt.items.values())
+    manager.assign_item(alice.id, steak.id)
+
+    AutoSplitEngine(manager).run_auto_split(only_unassigned=True)
+
+    assert manager.get_assignees(steak.id) == [alice.id]
+    assert manager.get_assignees(tea.id) == [bob.id]
+    assert manager.get_summary() == {"Alice": 90.0, "Bob": 5.0}
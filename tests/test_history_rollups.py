@@ -0,0 +1,78 @@
+import sqlite3
+
+from modules.data.assignment_data import ParticipantData, SplitManager
+from modules.data.history_store import HistoryStore, history_key
+from modules.data.receipt_data import ReceiptData
+
+ROLLUPS = {
+    "rollup_day": "day",
+    "rollup_month": "month",
+    "rollup_category": "day, category",
+    "rollup_participant": "day, norm_name",
+}
+
+
+def _receipt(rows, *names):
+    receipt = ReceiptData.from_list(rows, sum(r["price"] for r in rows))
+    people = [ParticipantData(n) for n in names]
+    manager = SplitManager(people, receipt.items)
+    for i, item in enumerate(receipt.items.values()):
+        manager.assign_item(people[i % len(people)].id, item.id)
+    return receipt, manager
+
+
+def _rollups(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            table: [tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+                    for row in conn.execute(f"SELECT * FROM {table} ORDER BY {order}")]
+            for table, order in ROLLUPS.items()
+        }
+    finally:
+        conn.close()
+
+
+def _rebuilt(path, tmp_path):
+    """Rollups recomputed from scratch: empty them, reset user_version and reopen (backfill)."""
+    copy = str(tmp_path / "rebuilt.sqlite3")
+    src, dst = sqlite3.connect(path), sqlite3.connect(copy)
+    src.backup(dst)
+    src.close()
+    with dst:
+        for table in ROLLUPS:
+            dst.execute(f"DELETE FROM {table}")
+        dst.execute("PRAGMA user_version = 0")
+    dst.close()
+    HistoryStore(copy).close()
+    return _rollups(copy)
+
+
+def test_rollups_follow_add_resave_and_delete(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    lunch, lunch_split = _receipt(
+        [{"name": "Nasi Goreng", "price": 30.0, "category": "Food"},
+         {"name": "Es Teh", "price": 10.0, "category": "Drink"}],
+        "Alice", "Bob",
+    )
+    dinner, dinner_split = _receipt(
+        [{"name": "Sate", "price": 45.0, "category": "Food"}], "Alice",
+    )
+    store = HistoryStore(path)
+    try:
+        store.save_receipt(lunch, lunch_split, date="2026-03-14").result(timeout=10)
+        store.save_receipt(dinner, dinner_split, date="2026-03-14").result(timeout=10)
+
+        # Re-save with an edited price on another day: the old contribution must go
+        lunch.update_item(list(lunch.items.keys())[1], price=12.0)
+        store.save_receipt(lunch, lunch_split, date="2026-04-02").result(timeout=10)
+        store.delete_receipt(history_key(dinner)).result(timeout=10)
+        tile = store.month_tile("2026-03").result(timeout=10)
+    finally:
+        store.close()
+
+    rollups = _rollups(path)
+    assert rollups == _rebuilt(path, tmp_path)
+    assert tile == {"total": 0.0, "n_receipts": 0, "n_items": 0}  # March emptied and cleaned up
+    assert rollups["rollup_day"] == [("2026-04-02", 42.0, 1, 2)]
+    assert [row[1:4] for row in rollups["rollup_participant"]] == [("alice", "Alice", 30.0), ("bob", "Bob", 12.0)]
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from modules.data.assignment_data import ParticipantData, SplitManager
+from modules.data.history_store import HistoryStore, history_key
+from modules.data.receipt_data import ReceiptData
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAVE_ONE = textwrap.dedent("""
+    import sys
+    from modules.data.history_store import HistoryStore
+    from modules.data.receipt_data import ReceiptData
+
+    receipt = ReceiptData.from_list([{"name": sys.argv[2], "price": 10.0, "category": "Food"}], 10.0)
+    store = HistoryStore(sys.argv[1])
+    store.save_receipt(receipt).result(timeout=10)
+    store.close()
+    print(receipt.id)
+""")
+
+
+def test_saves_from_two_processes_do_not_replace_each_other(tmp_path):
+    db = str(tmp_path / "history.sqlite3")
+    ids = [
+        subprocess.run([sys.executable, "-c", SAVE_ONE, db, name], cwd=ROOT, check=True,
+                       capture_output=True, text=True).stdout.split()[-1]
+        for name in ("Nasi Goreng", "Es Teh")
+    ]
+    assert ids[0] == ids[1]  # same per-process id in both runs
+
+    store = HistoryStore(db)
+    try:
+        count = store.query_df("SELECT COUNT(*) AS n FROM receipts").result(timeout=10)
+        names = store.query_df("SELECT name FROM items ORDER BY name").result(timeout=10)
+    finally:
+        store.close()
+    assert count["n"].tolist() == [2]
+    assert names["name"].tolist() == ["Es Teh", "Nasi Goreng"]
+
+
+def test_history_key_is_kept_across_saves(tmp_path):
+    receipt = ReceiptData.from_list([{"name": "Kopi", "price": 5.0, "category": "Drink"}], 5.0)
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    try:
+        store.save_receipt(receipt).result(timeout=10)
+        key = history_key(receipt)
+        store.save_receipt(receipt).result(timeout=10)
+        rows = store.query_df("SELECT id FROM receipts").result(timeout=10)
+    finally:
+        store.close()
+    assert rows["id"].tolist() == [key]
+
+
+def _split_receipt():
+    receipt = ReceiptData.from_list(
+        [{"name": "Nasi Goreng", "price": 30.0, "category": "Food"},
+         {"name": "Es Teh", "price": 10.0, "category": "Drink"}],
+        40.0,
+    )
+    alice, bob = ParticipantData("Alice"), ParticipantData("Bob")
+    manager = SplitManager([alice, bob], receipt.items)
+    rice, tea = list(receipt.items.values())
+    manager.assign_item(alice.id, rice.id)
+    manager.assign_item(bob.id, tea.id)
+    return receipt, manager
+
+
+def test_queries_read_a_saved_split(tmp_path):
+    receipt, manager = _split_receipt()
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    try:
+        store.save_receipt(receipt, manager, date="2026-03-14").result(timeout=10)
+        summary = store.summary("2026-03-01", "2026-03-31").result(timeout=10)
+        categories = store.category_totals("2026-03-01", "2026-03-31").result(timeout=10)
+        people = store.participant_totals("2026-03-01", "2026-03-31").result(timeout=10)
+        prices = store.item_history("es teh").result(timeout=10)
+        counts = store.preference_counts().result(timeout=10)
+        tile = store.month_tile("2026-03").result(timeout=10)
+    finally:
+        store.close()
+
+    assert summary.iloc[0].to_dict() == {"num_receipts": 1, "total_spent": 40.0, "num_items": 2}
+    assert dict(zip(categories["category"], categories["total_spent"])) == {"Food": 30.0, "Drink": 10.0}
+    assert dict(zip(people["participant"], people["total_spent"])) == {"Alice": 30.0, "Bob": 10.0}
+    assert prices["price"].tolist() == [10.0]
+    chosen = {(r.participant, r.item): (r.seen, r.chosen) for r in counts.itertuples()}
+    assert chosen[("alice", "nasi goreng")] == (1, 1)
+    assert chosen[("alice", "es teh")] == (1, 0)
+    assert tile == {"total": 40.0, "n_receipts": 1, "n_items": 2}
+
+
+def test_unavailable_store_fails_futures(tmp_path):
+    store = HistoryStore(str(tmp_path))  # a directory cannot be opened as a database
+    receipt, _ = _split_receipt()
+    with pytest.raises(Exception):
+        store.save_receipt(receipt).result(timeout=10)
+    with pytest.raises(Exception):
+        store.summary("2026-01-01", "2026-12-31").result(timeout=10)